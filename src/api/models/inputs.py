@@ -1,16 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class Inputs(BaseModel):
     skus: list[str]
+    horizon: int = Field(default=1, ge=1, le=366)
+    model_name: str | None = None
+    exec_date: str | None = None
 
     class Config:
+        protected_namespaces = ()
         json_schema_extra = {
             "example": {
                 "skus": [
                     "-1079705109983218228",
                     "-1025753159201624061",
                     "-129295609970996479",
-                ]
+                ],
+                "horizon": 1,
             }
         }
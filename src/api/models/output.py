@@ -3,6 +3,7 @@ from pydantic import BaseModel
 
 class Output(BaseModel):
     sku: str
+    date: str | None
     quantity_sold_min: float | None
     quantity_sold_max: float | None
 
@@ -12,5 +13,6 @@ class Output(BaseModel):
                 "quantity_sold_min": 10.5,
                 "quantity_sold_max": 20.0,
                 "sku": "-1025753159201624061",
+                "date": "2024-06-28",
             }
         }
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class Reload(BaseModel):
+    exec_date: str | None = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "exec_date": "2024-06-28-10-00-00",
+            }
+        }
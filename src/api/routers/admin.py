@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Security, status
+from fastapi.responses import ORJSONResponse
+
+import helpers.auth
+import helpers.lifespan
+
+from api.models.reload import Reload
+
+router = APIRouter(
+    tags=["Admin"],
+    dependencies=[Security(helpers.auth.check)],
+)
+
+
+@router.post(path="/reload")
+async def reload(inputs: Reload) -> ORJSONResponse:
+    """
+    Load a model and changed features in the background and swap them in,
+    the latest model by default
+    """
+    try:
+        exec_date = await helpers.lifespan.reload(exec_date=inputs.exec_date)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return ORJSONResponse(content={"exec_date": exec_date})
+
+
+@router.get(path="/models")
+async def models() -> ORJSONResponse:
+    """
+    Trained and evaluated models which can be selected in /predict
+    """
+    return ORJSONResponse(
+        content=[
+            {
+                "model_name": model_name,
+                "exec_date": exec_date,
+                "loaded": helpers.lifespan.registry.is_loaded(
+                    model_name=model_name, exec_date=exec_date
+                ),
+            }
+            for model_name, exec_date in helpers.lifespan.registry.list()
+        ]
+    )
@@ -1,5 +1,8 @@
 from fastapi import APIRouter
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+
+import helpers.timer
+import helpers.lifespan
 
 
 router = APIRouter(tags=["Other"])
@@ -16,3 +19,19 @@ async def health():
     Determine if the container is working and healthy
     """
     return ORJSONResponse(content=dict())
+
+
+@router.get("/cache")
+async def cache():
+    """
+    Hits, misses and evictions of the predictions cache
+    """
+    return ORJSONResponse(content=helpers.lifespan.cache.get_stats())
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Timing histograms of the prediction stages and sizes of the requests
+    """
+    return PlainTextResponse(content=helpers.timer.get_content())
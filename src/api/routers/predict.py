@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Security
-from fastapi.responses import ORJSONResponse
+import os
+import asyncio
+from datetime import datetime
+from collections.abc import AsyncIterator
+
+import pandas
+import pyarrow
+from fastapi import APIRouter, HTTPException, Query, Request, Security, status
+from fastapi.responses import Response, StreamingResponse
 
 import helpers.auth
+import helpers.timer
+import helpers.content
 import helpers.predict
 import helpers.lifespan
 
 from api.models.inputs import Inputs
+from api.models.output import Output
 
 router = APIRouter(
     tags=["Model"],
@@ -13,12 +23,115 @@ router = APIRouter(
 )
 
 
-@router.post(path="/predict")
-def predict(inputs: Inputs) -> ORJSONResponse:
-    predictions = helpers.predict.get_prediction(
-        inputs=inputs,
-        con=helpers.lifespan.con,
-        model=helpers.lifespan.model,
-        metrics=helpers.lifespan.metrics,
+def get_model(model_name: str | None, exec_date: str | None) -> tuple[str, str]:
+    try:
+        return helpers.lifespan.get_selection(
+            model_name=model_name, exec_date=exec_date
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+def get_content(predictions: pandas.DataFrame, media_type: str) -> bytes:
+    """serialize a whole response, run in a thread to keep the event loop free."""
+    with helpers.timer.timer(stage="serialize"):
+        if media_type == helpers.content.JSON:
+            return helpers.predict.get_content(predictions=predictions)
+        encoder = helpers.content.Encoder(media_type=media_type)
+        return encoder.get_content(predictions=predictions)
+
+
+def encode(encoder: helpers.content.Encoder, predictions: pandas.DataFrame) -> bytes:
+    """serialize a chunk of a streamed response, run in a thread as well."""
+    with helpers.timer.timer(stage="serialize"):
+        return encoder.encode(predictions=predictions)
+
+
+def get_media_type(request: Request) -> str:
+    media_type = helpers.content.get_media_type(accept=request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Accept one of {', '.join(helpers.content.MEDIA_TYPES)}",
+        )
+    return media_type
+
+
+async def get_prediction(
+    skus: list[str], horizon: int, model: tuple[str, str]
+) -> pandas.DataFrame:
+    """predict skus through the predictions cache and the batcher."""
+    key = (
+        *model,
+        datetime.now().strftime("%Y-%m-%d"),
+        horizon,
+        helpers.lifespan.served.snapshot.version,
     )
-    return ORJSONResponse(content=predictions.model_dump()["value"])
+    return await helpers.predict.get_cached_prediction(
+        key=key,
+        skus=skus,
+        cache=helpers.lifespan.cache,
+        predict=lambda skus: helpers.lifespan.batcher.submit(
+            skus=skus, horizon=horizon, model=model
+        ),
+    )
+
+
+@router.post(path="/predict", response_model=list[Output])
+async def predict(inputs: Inputs, request: Request) -> Response:
+    media_type = get_media_type(request=request)
+    helpers.timer.skus.observe(value=len(inputs.skus))
+    predictions = await get_prediction(
+        skus=inputs.skus,
+        horizon=inputs.horizon,
+        model=get_model(model_name=inputs.model_name, exec_date=inputs.exec_date),
+    )
+    content = await asyncio.to_thread(get_content, predictions, media_type)
+    return Response(content=content, media_type=media_type)
+
+
+@router.post(path="/predict/stream", response_model=list[Output])
+async def predict_stream(
+    request: Request,
+    horizon: int = Query(default=1, ge=1, le=366),
+    model_name: str | None = None,
+    exec_date: str | None = None,
+) -> StreamingResponse:
+    """
+    Predict skus sent as json `Inputs`, ndjson `{"sku": ...}` lines or an arrow
+    ipc `sku` column, results are computed and streamed by chunks of skus in
+    the `Accept` format
+    """
+    media_type = get_media_type(request=request)
+    content_type = helpers.content.get_content_type(
+        content_type=request.headers.get("content-type")
+    )
+    if content_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Send one of {', '.join(helpers.content.MEDIA_TYPES)}",
+        )
+    model = get_model(model_name=model_name, exec_date=exec_date)
+    chunk_size = int(os.environ.get("PREDICT_STREAM_CHUNK_SIZE", "10000"))
+    try:
+        skus = await helpers.content.get_skus(
+            request=request, content_type=content_type
+        )
+    except (ValueError, KeyError, TypeError, pyarrow.ArrowException) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not read skus: {e}",
+        )
+    helpers.timer.skus.observe(value=len(skus))
+
+    async def get_chunks() -> AsyncIterator[bytes]:
+        encoder = helpers.content.Encoder(media_type=media_type)
+        yield encoder.start()
+        for i in range(0, len(skus), chunk_size):
+            predictions = await get_prediction(
+                skus=skus[i : i + chunk_size], horizon=horizon, model=model
+            )
+            yield await asyncio.to_thread(encode, encoder, predictions)
+        yield encoder.end()
+
+    return StreamingResponse(content=get_chunks(), media_type=media_type)
@@ -0,0 +1,90 @@
+"""asyncio micro-batching of concurrent predictions."""
+
+import asyncio
+from itertools import groupby
+from typing import Generic, TypeVar
+from collections.abc import Callable, Hashable
+
+import numpy
+import pandas
+
+Key = TypeVar("Key", bound=Hashable)
+Request = tuple[list[str], int, Key, asyncio.Future]
+
+
+class Batcher(Generic[Key]):
+    """merge requests arriving within `window` seconds into one prediction.
+
+    A batch is flushed when its window ends or once it holds `max_size` skus.
+    Requests are grouped by horizon, `predict` gets the deduplicated skus of
+    every model of a group in one call run in a thread, and the rows of each
+    request are sent back to it.
+    """
+
+    def __init__(
+        self,
+        predict: Callable[[dict[Key, list[str]], int], dict[Key, pandas.DataFrame]],
+        window: float,
+        max_size: int,
+    ) -> None:
+        self.predict = predict
+        self.window = window
+        self.max_size = max_size
+        self.size = 0
+        self.requests: list[Request[Key]] = list()
+        self.timer: asyncio.TimerHandle | None = None
+        self.tasks: set[asyncio.Task] = set()
+
+    async def submit(
+        self, skus: list[str], horizon: int, model: Key
+    ) -> pandas.DataFrame:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.requests.append((skus, horizon, model, future))
+        self.size += len(skus)
+        if self.size >= self.max_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        requests, self.requests, self.size = self.requests, list(), 0
+        task = asyncio.create_task(self.run(requests=requests))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self, requests: list[Request[Key]]) -> None:
+        requests = sorted(requests, key=lambda request: request[1])
+        for horizon, items in groupby(requests, key=lambda request: request[1]):
+            group = list(items)
+            skus: dict[Key, set[str]] = dict()
+            for request_skus, _, model, _ in group:
+                skus.setdefault(model, set()).update(request_skus)
+            try:
+                predictions = await asyncio.to_thread(
+                    self.predict,
+                    {model: sorted(values) for model, values in skus.items()},
+                    horizon,
+                )
+            except Exception as e:
+                for *_, future in group:
+                    if future.done() is False:
+                        future.set_exception(e)
+                continue
+
+            positions = {
+                model: x.groupby("sku", sort=False).indices
+                for model, x in predictions.items()
+            }
+            for request_skus, _, model, future in group:
+                if future.done():
+                    continue
+                rows = numpy.concatenate(
+                    [positions[model][sku] for sku in sorted(set(request_skus))]
+                    or [numpy.empty(shape=0, dtype=numpy.int64)]
+                )
+                future.set_result(predictions[model].iloc[rows].reset_index(drop=True))
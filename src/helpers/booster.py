@@ -0,0 +1,51 @@
+"""lightweight xgboost booster exported from a sklearn pipeline."""
+
+import os
+import json
+
+import numpy
+import pandas
+import xgboost
+import scipy.sparse
+
+from helpers.skus import get_positions
+
+
+class Booster:
+    """predict like the exported pipeline without unpickling it."""
+
+    def __init__(self, folder_path: str) -> None:
+        with open(os.path.join(folder_path, "booster.json"), mode="r") as f:
+            metadata = json.load(f)
+        self.features: list[str] = metadata["features"]
+        self.sparse_output: bool = metadata["sparse_output"]
+        self.encoding: str = metadata.get("encoding", "onehot")
+        self.skus = numpy.load(os.path.join(folder_path, "skus.npy"), mmap_mode="r")
+        self.booster = xgboost.Booster(
+            model_file=os.path.join(folder_path, "booster.ubj")
+        )
+
+    def transform(self, X: pandas.DataFrame) -> numpy.ndarray | scipy.sparse.csr_matrix:
+        """numeric features followed by the encoded sku, like the fitted pipeline."""
+        positions, known = get_positions(
+            sorted_skus=self.skus, skus=X["sku"].to_numpy(dtype=str)
+        )
+        numeric = X[self.features].to_numpy(dtype=numpy.float64)
+
+        if self.encoding == "ordinal":
+            codes = numpy.where(known, positions, numpy.nan)
+            return numpy.column_stack([numeric, codes])
+
+        rows = numpy.flatnonzero(known)
+        onehot = scipy.sparse.csr_matrix(
+            (numpy.ones(len(rows)), (rows, positions[known])),
+            shape=(len(X), len(self.skus)),
+        )
+        if self.sparse_output:
+            return scipy.sparse.hstack(
+                [scipy.sparse.csr_matrix(numeric), onehot], format="csr"
+            )
+        return numpy.hstack([numeric, onehot.toarray()])
+
+    def predict(self, X: pandas.DataFrame) -> numpy.ndarray:
+        return self.booster.inplace_predict(self.transform(X=X))
@@ -0,0 +1,68 @@
+"""in-process prediction cache."""
+
+import time
+import threading
+from typing import Any
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+
+
+class Cache:
+    """thread-safe LRU cache with a time to live, counting its hits and misses."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.items: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_many(self, keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        """return the values of cached keys, missing and expired keys are left out."""
+        now = time.monotonic()
+        values = dict()
+        with self.lock:
+            for key in keys:
+                item = self.items.get(key)
+                if item is not None and now - item[0] > self.ttl:
+                    del self.items[key]
+                    self.expirations += 1
+                    item = None
+                if item is None:
+                    self.misses += 1
+                    continue
+                self.items.move_to_end(key)
+                values[key] = item[1]
+                self.hits += 1
+        return values
+
+    def set_many(self, values: dict[Hashable, Any]) -> None:
+        if self.max_size == 0:
+            return
+        now = time.monotonic()
+        with self.lock:
+            for key, value in values.items():
+                self.items[key] = (now, value)
+                self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.items.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "size": len(self.items),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,15 @@
+"""columns of the model, kept free of dependencies."""
+
+TARGET = "quantity_sold"
+FEATURES = [
+    "day",
+    "year",
+    "month",
+    "is_weekend",
+    "day_of_year",
+    "day_of_week",
+    "week_of_year",
+    "rolling_mean_7",
+    "quantity_sold_lag_1",
+    "quantity_sold_lag_7",
+]
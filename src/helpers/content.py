@@ -0,0 +1,123 @@
+"""content negotiation of predictions."""
+
+import io
+
+import orjson
+import pandas
+import pyarrow
+import pyarrow.ipc
+from fastapi import Request
+
+import helpers.predict
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+ARROW = "application/vnd.apache.arrow.stream"
+MEDIA_TYPES = [JSON, NDJSON, ARROW]
+
+SCHEMA = pyarrow.schema(
+    [
+        ("sku", pyarrow.string()),
+        ("date", pyarrow.string()),
+        ("quantity_sold_min", pyarrow.float64()),
+        ("quantity_sold_max", pyarrow.float64()),
+    ]
+)
+
+
+def get_media_type(accept: str | None) -> str | None:
+    """first supported media type of an `Accept` header, json by default."""
+    if accept is None:
+        return JSON
+    for item in accept.split(","):
+        media_type = item.split(";")[0].strip()
+        if media_type in MEDIA_TYPES:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON
+    return None
+
+
+def get_content_type(content_type: str | None) -> str | None:
+    """supported media type of a `Content-Type` header, json by default."""
+    media_type = (content_type or JSON).split(";")[0].strip()
+    return media_type if media_type in MEDIA_TYPES else None
+
+
+class Encoder:
+    """serialize predictions chunk by chunk as a json array, ndjson or arrow ipc."""
+
+    def __init__(self, media_type: str) -> None:
+        self.media_type = media_type
+        self.count = 0
+        self.sink = io.BytesIO()
+        self.writer = None
+        if media_type == ARROW:
+            self.writer = pyarrow.ipc.new_stream(sink=self.sink, schema=SCHEMA)
+
+    def pop(self) -> bytes:
+        content = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return content
+
+    def start(self) -> bytes:
+        return b"[" if self.media_type == JSON else self.pop()
+
+    def encode(self, predictions: pandas.DataFrame) -> bytes:
+        if self.writer is not None:
+            self.writer.write_table(
+                pyarrow.Table.from_pandas(
+                    df=predictions[SCHEMA.names],
+                    schema=SCHEMA,
+                    preserve_index=False,
+                )
+            )
+            return self.pop()
+
+        records = helpers.predict.get_records(predictions=predictions)
+        if self.media_type == NDJSON:
+            return b"".join(orjson.dumps(record) + b"\n" for record in records)
+
+        if len(records) == 0:
+            return b""
+        content = orjson.dumps(records)[1:-1]
+        if self.count > 0:
+            content = b"," + content
+        self.count += len(records)
+        return content
+
+    def end(self) -> bytes:
+        if self.writer is not None:
+            self.writer.close()
+            return self.pop()
+        return b"]" if self.media_type == JSON else b""
+
+    def get_content(self, predictions: pandas.DataFrame) -> bytes:
+        return self.start() + self.encode(predictions=predictions) + self.end()
+
+
+async def get_skus(request: Request, content_type: str) -> list[str]:
+    """read the skus of a request body.
+
+    Arrow ipc bodies hold a `sku` column, ndjson bodies one `{"sku": ...}`
+    object per line, parsed while they are received, json bodies are `Inputs`.
+    """
+    if content_type == ARROW:
+        table = pyarrow.ipc.open_stream(source=await request.body()).read_all()
+        return [str(sku) for sku in table.column("sku").to_pylist()]
+
+    if content_type == NDJSON:
+        skus: list[str] = list()
+        buffer = b""
+        async for data in request.stream():
+            lines = (buffer + data).split(b"\n")
+            buffer = lines.pop()
+            skus.extend(
+                str(orjson.loads(line)["sku"]) for line in lines if line.strip()
+            )
+        if len(buffer.strip()) > 0:
+            skus.append(str(orjson.loads(buffer)["sku"]))
+        return skus
+
+    return [str(sku) for sku in orjson.loads(await request.body())["skus"]]
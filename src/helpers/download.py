@@ -2,44 +2,98 @@
 
 import os
 import json
-from typing import Literal
+from typing import Literal, TYPE_CHECKING
+from collections.abc import Iterator
 
-import joblib
 import pandas
 import duckdb
+import pyarrow
+import pyarrow.dataset
 from duckdb import DuckDBPyConnection
-from sklearn.pipeline import Pipeline
+
+from helpers.pool import Pool
+from helpers.intervals import Intervals
+from helpers.columns import FEATURES, TARGET
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+    from helpers.booster import Booster
+    from helpers.segmented import Segmented
+
+COLUMNS = ["sku", *FEATURES, TARGET]
+
+
+def get_dataset(
+    cache_dir: str,
+    type_: Literal["train", "test"],
+) -> pyarrow.dataset.Dataset:
+    folder_path = os.path.join(cache_dir, f"datasets/type={type_}")
+    if os.path.exists(folder_path) is False:
+        raise ValueError(f"Folder doesn't exist: {folder_path}")
+    partitioning = pyarrow.dataset.partitioning(
+        schema=pyarrow.schema([("year", pyarrow.int64())]),
+        flavor="hive",
+    )
+    return pyarrow.dataset.dataset(
+        source=folder_path,
+        format="parquet",
+        partitioning=partitioning,
+    )
+
+
+def split_target(
+    data: pandas.DataFrame,
+) -> tuple[pandas.DataFrame, pandas.DataFrame]:
+    """pop the target column, the features frame is not copied."""
+    y = data.pop(TARGET).to_frame()
+    return data, y
 
 
 def get_item(
     cache_dir: str,
     type_: Literal["train", "test"],
 ) -> pandas.DataFrame:
-    file_path = os.path.join(cache_dir, f"datasets/type={type_}/result.parquet")
-    if os.path.exists(file_path) is False:
-        raise ValueError(f"File doesn't exist: {file_path}")
-    return pandas.read_parquet(file_path)
+    """load only the model columns, numeric columns are converted without copy."""
+    table = get_dataset(cache_dir=cache_dir, type_=type_).to_table(columns=COLUMNS)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def get_batches(
+    cache_dir: str,
+    batch_size: int,
+    type_: Literal["train", "test"],
+) -> Iterator[tuple[pandas.DataFrame, pandas.DataFrame]]:
+    """stream the model columns by batches of at most `batch_size` rows."""
+    dataset = get_dataset(cache_dir=cache_dir, type_=type_)
+    for batch in dataset.to_batches(columns=COLUMNS, batch_size=batch_size):
+        yield split_target(data=batch.to_pandas(split_blocks=True, self_destruct=True))
 
 
 def get_train_data(
     cache_dir: str,
 ) -> tuple[pandas.DataFrame, pandas.DataFrame]:
-    data = get_item(cache_dir=cache_dir, type_="train")
-    return data.drop(labels="quantity_sold", axis=1), data[["quantity_sold"]]
+    return split_target(data=get_item(cache_dir=cache_dir, type_="train"))
 
 
 def get_test_data(
     cache_dir: str,
 ) -> tuple[pandas.DataFrame, pandas.DataFrame]:
-    data = get_item(cache_dir=cache_dir, type_="test")
-    return data.drop(labels="quantity_sold", axis=1), data[["quantity_sold"]]
+    return split_target(data=get_item(cache_dir=cache_dir, type_="test"))
 
 
 def get_model(
     exec_date: str,
     cache_dir: str,
     model_name: str,
-) -> Pipeline:
+) -> "Pipeline | Segmented":
+    """load a pipeline, or the routed models of a segmented training.
+
+    joblib imports the modules of the pickled model, scikit-learn and xgboost
+    are loaded here only when the model needs them.
+    """
+    import joblib
+
     file_path = os.path.join(
         cache_dir, f"models/model={model_name}/exec_date={exec_date}/result.joblib"
     )
@@ -48,13 +102,87 @@ def get_model(
     return joblib.load(filename=file_path)
 
 
+def get_exec_dates(
+    cache_dir: str,
+    model_name: str,
+) -> list[str]:
+    """sorted exec dates of a model which is both trained and evaluated."""
+    folder_path = os.path.join(cache_dir, f"models/model={model_name}")
+    if os.path.exists(folder_path) is False:
+        return list()
+
+    exec_dates = [
+        name.removeprefix("exec_date=")
+        for name in os.listdir(folder_path)
+        if name.startswith("exec_date=")
+    ]
+    return sorted(
+        exec_date
+        for exec_date in exec_dates
+        if os.path.exists(
+            os.path.join(
+                cache_dir,
+                f"metrics/model={model_name}/exec_date={exec_date}/result.json",
+            )
+        )
+    )
+
+
+def get_latest_exec_date(
+    cache_dir: str,
+    model_name: str,
+) -> str | None:
+    """latest exec date of a model which is both trained and evaluated."""
+    exec_dates = get_exec_dates(cache_dir=cache_dir, model_name=model_name)
+    return exec_dates[-1] if len(exec_dates) > 0 else None
+
+
+def get_booster(
+    exec_date: str,
+    cache_dir: str,
+    model_name: str,
+) -> "Booster":
+    from helpers.booster import Booster
+
+    folder_path = os.path.join(
+        cache_dir, f"models/model={model_name}/exec_date={exec_date}"
+    )
+    file_path = os.path.join(folder_path, "booster.ubj")
+    if os.path.exists(file_path) is False:
+        raise ValueError(f"File doesn't exist: {file_path}")
+    return Booster(folder_path=folder_path)
+
+
 def get_db(
     cache_dir: str,
+    read_only: bool = False,
 ) -> DuckDBPyConnection:
     file_path = os.path.join(cache_dir, "database/result.duckdb")
     if os.path.exists(file_path) is False:
         raise ValueError(f"File doesn't exist: {file_path}")
-    return duckdb.connect(database=file_path)
+    return duckdb.connect(database=file_path, read_only=read_only)
+
+
+def get_pool(
+    cache_dir: str,
+    size: int,
+) -> Pool:
+    file_path = os.path.join(cache_dir, "database/result.duckdb")
+    if os.path.exists(file_path) is False:
+        raise ValueError(f"File doesn't exist: {file_path}")
+    return Pool(database=file_path, size=size)
+
+
+def get_latest_features(
+    con: DuckDBPyConnection,
+) -> pandas.DataFrame:
+    """load latest features per sku, indexed by sku."""
+    return (
+        con.execute("SELECT * FROM latest_features")
+        .fetch_df()
+        .set_index("sku")
+        .sort_index()
+    )
 
 
 def get_metrics(
@@ -70,3 +198,17 @@ def get_metrics(
 
     with open(file_path, mode="r") as f:
         return json.load(f)
+
+
+def get_intervals(
+    exec_date: str,
+    cache_dir: str,
+    model_name: str,
+) -> Intervals | None:
+    """per-sku intervals of a model, None if it was evaluated without them."""
+    folder_path = os.path.join(
+        cache_dir, f"metrics/model={model_name}/exec_date={exec_date}"
+    )
+    if os.path.exists(os.path.join(folder_path, "intervals.json")) is False:
+        return None
+    return Intervals(folder_path=folder_path)
@@ -0,0 +1,42 @@
+"""import time report of a command."""
+
+import sys
+import time
+import logging
+import builtins
+
+import orjson
+
+original = builtins.__import__
+active: list[str] = list()
+seconds: dict[str, float] = dict()
+
+
+def track(name: str, globals=None, locals=None, fromlist=(), level=0):
+    """`__import__` timing the first import of every top-level package.
+
+    The time of a package is cumulative, it includes the packages it imports.
+    """
+    package = name.partition(".")[0]
+    if level > 0 or name in sys.modules or package in active:
+        return original(name, globals, locals, fromlist, level)
+
+    active.append(package)
+    start = time.perf_counter()
+    try:
+        return original(name, globals, locals, fromlist, level)
+    finally:
+        active.pop()
+        seconds[package] = seconds.get(package, 0) + time.perf_counter() - start
+
+
+def init() -> None:
+    builtins.__import__ = track
+
+
+def report() -> None:
+    """log the import time of every package, slowest first."""
+    builtins.__import__ = original
+    for package, value in sorted(seconds.items(), key=lambda item: -item[1]):
+        line = {"stage": "import", "package": package, "seconds": round(value, 6)}
+        logging.info(orjson.dumps(line).decode())
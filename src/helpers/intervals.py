@@ -0,0 +1,29 @@
+"""per-sku prediction intervals computed by evaluate."""
+
+import os
+import json
+
+import numpy
+
+from helpers.skus import get_positions
+
+
+class Intervals:
+    """residual quantiles of every sku, looked up in the sorted skus."""
+
+    def __init__(self, folder_path: str) -> None:
+        with open(os.path.join(folder_path, "intervals.json"), mode="r") as f:
+            metadata = json.load(f)
+        self.coverage: float = metadata["coverage"]
+        self.default = numpy.array(metadata["default"], dtype=numpy.float64)
+        self.skus = numpy.load(
+            os.path.join(folder_path, "interval_skus.npy"), mmap_mode="r"
+        )
+        self.bounds = numpy.load(os.path.join(folder_path, "intervals.npy"))
+
+    def get_bounds(self, skus: numpy.ndarray) -> numpy.ndarray:
+        """lower and upper residual of every sku, the global ones if unknown."""
+        if len(self.skus) == 0:
+            return numpy.tile(self.default, (len(skus), 1))
+        positions, known = get_positions(sorted_skus=self.skus, skus=skus)
+        return numpy.where(known[:, None], self.bounds[positions], self.default)
@@ -1,50 +1,292 @@
 """lifespan definition."""
 
 import os
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+import threading
+from typing import NamedTuple, TYPE_CHECKING
+from collections.abc import Iterator
+from contextlib import contextmanager, asynccontextmanager
 
+import pandas
 from fastapi import FastAPI
-from sklearn.pipeline import Pipeline
-from duckdb import DuckDBPyConnection
 
+import helpers.timer
+import helpers.predict
 import helpers.download
+from helpers.pool import Pool
+from helpers.cache import Cache
+from helpers.batcher import Batcher
+from helpers.registry import Registry
+from helpers.intervals import Intervals
 
-metrics: dict
-model: Pipeline
-con: DuckDBPyConnection
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+    from helpers.booster import Booster
+    from helpers.segmented import Segmented
+
+
+class Artifact(NamedTuple):
+    """model, metrics and intervals of one training, swapped together on reload."""
+
+    exec_date: str
+    model: "Pipeline | Booster | Segmented"
+    metrics: dict
+    intervals: Intervals | None
+
+
+class Snapshot(NamedTuple):
+    """latest features of one prepared database.
+
+    Features are the in-memory sku index, or a pool of cursors querying the
+    database with `FEATURES_STORE=duckdb`. The version is the database mtime.
+    """
+
+    version: str
+    features: pandas.DataFrame | Pool
+
+
+class Served(NamedTuple):
+    """served model and the features it predicts from, swapped as one on reload."""
+
+    artifact: Artifact
+    snapshot: Snapshot
+
+
+cache: Cache
+batcher: Batcher[tuple[str, str]]
+served: Served
+registry: Registry
+lock: asyncio.Lock
+swap: threading.Lock
+watcher: asyncio.Task | None
+
+
+def get_artifact(model_name: str, exec_date: str) -> Artifact:
+    """load the model and the metrics of `model_name` trained at `exec_date`.
+
+    With `MODEL_FORMAT=booster`, models exported as a booster are loaded as one.
+    """
+    get_model = helpers.download.get_model
+    folder_path = os.path.join(
+        os.environ["CACHE_DIR"], f"models/model={model_name}/exec_date={exec_date}"
+    )
+    if os.environ.get("MODEL_FORMAT", "joblib") == "booster" and os.path.exists(
+        os.path.join(folder_path, "booster.ubj")
+    ):
+        get_model = helpers.download.get_booster
+
+    return Artifact(
+        exec_date=exec_date,
+        model=get_model(
+            exec_date=exec_date,
+            model_name=model_name,
+            cache_dir=os.environ["CACHE_DIR"],
+        ),
+        metrics=helpers.download.get_metrics(
+            exec_date=exec_date,
+            model_name=model_name,
+            cache_dir=os.environ["CACHE_DIR"],
+        ),
+        intervals=helpers.download.get_intervals(
+            exec_date=exec_date,
+            model_name=model_name,
+            cache_dir=os.environ["CACHE_DIR"],
+        ),
+    )
+
+
+def get_version() -> str:
+    file_path = os.path.join(os.environ["CACHE_DIR"], "database/result.duckdb")
+    return str(os.stat(file_path).st_mtime_ns)
+
+
+def get_snapshot() -> Snapshot:
+    """load the latest features, the database is closed right after in memory.
+
+    Only `FEATURES_STORE=duckdb` keeps the database open, and locked for
+    `prepare`, while the api runs.
+    """
+    version = get_version()
+    pool = helpers.download.get_pool(
+        cache_dir=os.environ["CACHE_DIR"],
+        size=int(os.environ.get("DB_POOL_SIZE", "4")),
+    )
+    if os.environ.get("FEATURES_STORE", "memory") != "memory":
+        return Snapshot(version=version, features=pool)
+
+    with pool.cursor() as con:
+        features = helpers.download.get_latest_features(con=con)
+    pool.close()
+    return Snapshot(version=version, features=features)
+
+
+def get_selection(model_name: str | None, exec_date: str | None) -> tuple[str, str]:
+    """resolve a model selector to `(model_name, exec_date)`.
+
+    Without selector it is the served model, without exec date the latest
+    evaluated one of the model.
+    """
+    if model_name is None and exec_date is None:
+        return os.environ["MODEL_NAME"], served.artifact.exec_date
+
+    model_name = model_name or os.environ["MODEL_NAME"]
+    exec_dates = helpers.download.get_exec_dates(
+        cache_dir=os.environ["CACHE_DIR"], model_name=model_name
+    )
+    if exec_date is None and len(exec_dates) > 0:
+        exec_date = exec_dates[-1]
+    if exec_date not in exec_dates:
+        raise ValueError(f"No model found for {model_name} {exec_date or ''}".strip())
+    return model_name, exec_date
+
+
+def get_model_artifact(current: Artifact, model_name: str, exec_date: str) -> Artifact:
+    """the served model, other models come from the registry."""
+    if model_name == os.environ["MODEL_NAME"] and exec_date == current.exec_date:
+        return current
+    return registry.get(model_name=model_name, exec_date=exec_date)
+
+
+async def reload(exec_date: str | None = None) -> str:
+    """load a model and the latest features in a thread and swap them in.
+
+    The model is the latest one by default, features are loaded again when
+    the database changed since the last load. Requests already running keep
+    the model and features they started with.
+    """
+    global served
+
+    async with lock:
+        if exec_date is None:
+            exec_date = helpers.download.get_latest_exec_date(
+                cache_dir=os.environ["CACHE_DIR"],
+                model_name=os.environ["MODEL_NAME"],
+            )
+        if exec_date is None:
+            raise ValueError(f"No model found for {os.environ['MODEL_NAME']}")
+
+        artifact, snapshot = served
+        if exec_date != artifact.exec_date:
+            logging.info(f"reload model {exec_date}")
+            artifact = await asyncio.to_thread(
+                get_artifact, os.environ["MODEL_NAME"], exec_date
+            )
+        if get_version() != snapshot.version:
+            logging.info("reload features")
+            snapshot = await asyncio.to_thread(get_snapshot)
+        with swap:
+            previous, served = served, Served(artifact=artifact, snapshot=snapshot)
+        if snapshot is not previous.snapshot:
+            if isinstance(previous.snapshot.features, Pool):
+                previous.snapshot.features.retire()
+        return artifact.exec_date
+
+
+async def watch(interval: float) -> None:
+    """reload the latest model every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reload()
+        except Exception as e:
+            logging.error(f"failed to reload model: {e}")
 
 
 async def init() -> None:
     """initialize api global variables."""
-    global con, model, metrics
+    global lock, swap, cache, served, batcher, watcher, registry
 
-    logging.info("initialize model")
-    model = helpers.download.get_model(
+    logging.info("initialize model, intervals & features")
+    lock = asyncio.Lock()
+    swap = threading.Lock()
+    served = Served(
+        artifact=get_artifact(
+            model_name=os.environ["MODEL_NAME"], exec_date=os.environ["EXEC_DATE"]
+        ),
+        snapshot=get_snapshot(),
+    )
+    registry = Registry(
+        load=get_artifact,
         cache_dir=os.environ["CACHE_DIR"],
-        exec_date=os.environ["EXEC_DATE"],
-        model_name=os.environ["MODEL_NAME"],
+        max_bytes=int(os.environ.get("MODEL_REGISTRY_MAX_MB", "1024")) * 2**20,
     )
 
-    logging.info("initialize db")
-    con = helpers.download.get_db(
-        cache_dir=os.environ["CACHE_DIR"],
+    logging.info("initialize predictions cache")
+    cache = Cache(
+        max_size=int(os.environ.get("PREDICTIONS_CACHE_SIZE", "10000")),
+        ttl=float(os.environ.get("PREDICTIONS_CACHE_TTL", "3600")),
     )
 
-    logging.info("initialize intervals")
-    metrics = helpers.download.get_metrics(
-        cache_dir=os.environ["CACHE_DIR"],
-        exec_date=os.environ["EXEC_DATE"],
-        model_name=os.environ["MODEL_NAME"],
+    logging.info("initialize predictions batcher")
+    batcher = Batcher(
+        predict=get_prediction,
+        window=float(os.environ.get("PREDICT_BATCH_WINDOW_MS", "2")) / 1000,
+        max_size=int(os.environ.get("PREDICT_BATCH_MAX_SIZE", "1000")),
     )
 
+    watcher = None
+    interval = float(os.environ.get("MODEL_RELOAD_INTERVAL", "0"))
+    if interval > 0:
+        logging.info(f"watch new models every {interval}s")
+        watcher = asyncio.create_task(watch(interval=interval))
+
+
+@contextmanager
+def get_served() -> Iterator[Served]:
+    """the served model and features, a replaced pool stays open until exit."""
+    with swap:
+        current = served
+        features = current.snapshot.features
+        if isinstance(features, Pool):
+            features.acquire()
+    try:
+        yield current
+    finally:
+        if isinstance(features, Pool):
+            features.release()
+
+
+def get_prediction(
+    models: dict[tuple[str, str], list[str]], horizon: int
+) -> dict[tuple[str, str], pandas.DataFrame]:
+    """lookup features of all skus once, then predict intervals of every model."""
+    skus = sorted({sku for values in models.values() for sku in values})
+    with get_served() as current, helpers.timer.timer(stage="features"):
+        features = current.snapshot.features
+        if isinstance(features, Pool):
+            with features.cursor() as con:
+                x = helpers.predict.get_features(con=con, skus=skus)
+        else:
+            x = helpers.predict.get_index_features(skus=skus, index=features)
+
+    predictions = dict()
+    for (model_name, exec_date), model_skus in models.items():
+        artifact = get_model_artifact(
+            current=current.artifact, model_name=model_name, exec_date=exec_date
+        )
+        predictions[(model_name, exec_date)] = helpers.predict.get_prediction(
+            skus=model_skus,
+            features=x if len(models) == 1 else x[x["sku"].isin(model_skus)],
+            horizon=horizon,
+            model=artifact.model,
+            metrics=artifact.metrics,
+            intervals=artifact.intervals,
+        )
+    return predictions
+
 
 async def close() -> None:
     """delete api global variables."""
-    global con, model, metrics
+    global cache, served, batcher, watcher, registry
 
-    con.close()
-    del model, metrics
+    if watcher is not None:
+        watcher.cancel()
+    if isinstance(served.snapshot.features, Pool):
+        served.snapshot.features.retire()
+    cache.clear()
+    del served, batcher, registry
 
 
 @asynccontextmanager
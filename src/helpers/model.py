@@ -1,30 +1,42 @@
+import numpy
 from xgboost import XGBRegressor
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
 
+from helpers.columns import FEATURES
+
+XGBOOST_PARAMS = {
+    "regressor__max_depth": [3, 5, 7, 9, 11],
+    "regressor__subsample": [0.6, 0.7, 0.8, 0.9, 1.0],
+    "regressor__learning_rate": [0.01, 0.05, 0.1, 0.15],
+    "regressor__n_estimators": [100, 200, 300, 400, 500],
+    "regressor__colsample_bytree": [0.6, 0.7, 0.8, 0.9, 1.0],
+}
+
+
+def get_search(model: Pipeline, param_dist: dict, n_iter: int) -> RandomizedSearchCV:
+    """randomized search of `model` over time series folds, shared by all models."""
+    tscv = TimeSeriesSplit(n_splits=5)
+
+    return RandomizedSearchCV(
+        model,
+        param_dist,
+        n_iter=n_iter,
+        cv=tscv,
+        scoring="neg_mean_absolute_error",
+        n_jobs=-1,
+        verbose=0,
+        random_state=42,
+    )
+
 
 def get_xgboost_regression() -> RandomizedSearchCV:
     preprocessor = ColumnTransformer(
         transformers=[
-            (
-                "num",
-                "passthrough",
-                [
-                    "day",
-                    "year",
-                    "month",
-                    "is_weekend",
-                    "day_of_year",
-                    "day_of_week",
-                    "week_of_year",
-                    "rolling_mean_7",
-                    "quantity_sold_lag_1",
-                    "quantity_sold_lag_7",
-                ],
-            ),
+            ("num", "passthrough", FEATURES),
             ("cat", OneHotEncoder(handle_unknown="ignore"), ["sku"]),
         ]
     )
@@ -36,47 +48,46 @@ def get_xgboost_regression() -> RandomizedSearchCV:
         ]
     )
 
-    param_dist = {
-        "regressor__max_depth": [3, 5, 7, 9, 11],
-        "regressor__subsample": [0.6, 0.7, 0.8, 0.9, 1.0],
-        "regressor__learning_rate": [0.01, 0.05, 0.1, 0.15],
-        "regressor__n_estimators": [100, 200, 300, 400, 500],
-        "regressor__colsample_bytree": [0.6, 0.7, 0.8, 0.9, 1.0],
-    }
+    return get_search(model=model, param_dist=XGBOOST_PARAMS, n_iter=50)
 
-    tscv = TimeSeriesSplit(n_splits=5)
 
-    return RandomizedSearchCV(
-        model,
-        param_dist,
-        n_iter=50,
-        cv=tscv,
-        scoring="neg_mean_absolute_error",
-        n_jobs=-1,
-        verbose=0,
-        random_state=42,
+def get_xgboost_categorical_regression() -> RandomizedSearchCV:
+    """xgboost on a dense matrix, sku is one ordinal column split natively."""
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("num", "passthrough", FEATURES),
+            (
+                "cat",
+                OrdinalEncoder(
+                    handle_unknown="use_encoded_value", unknown_value=numpy.nan
+                ),
+                ["sku"],
+            ),
+        ]
+    )
+
+    model = Pipeline(
+        steps=[
+            ("preprocessor", preprocessor),
+            (
+                "regressor",
+                XGBRegressor(
+                    random_state=42,
+                    tree_method="hist",
+                    enable_categorical=True,
+                    feature_types=["q"] * len(FEATURES) + ["c"],
+                ),
+            ),
+        ]
     )
 
+    return get_search(model=model, param_dist=XGBOOST_PARAMS, n_iter=50)
+
 
 def get_linear_regression() -> RandomizedSearchCV:
     preprocessor = ColumnTransformer(
         transformers=[
-            (
-                "num",
-                "passthrough",
-                [
-                    "day",
-                    "year",
-                    "month",
-                    "is_weekend",
-                    "day_of_year",
-                    "day_of_week",
-                    "week_of_year",
-                    "rolling_mean_7",
-                    "quantity_sold_lag_1",
-                    "quantity_sold_lag_7",
-                ],
-            ),
+            ("num", "passthrough", FEATURES),
             ("cat", OneHotEncoder(handle_unknown="ignore"), ["sku"]),
         ]
     )
@@ -88,23 +99,14 @@ def get_linear_regression() -> RandomizedSearchCV:
         ]
     )
 
-    tscv = TimeSeriesSplit(n_splits=5)
-
-    return RandomizedSearchCV(
-        model,
-        dict(),
-        n_iter=10,
-        cv=tscv,
-        scoring="neg_mean_absolute_error",
-        n_jobs=-1,
-        verbose=0,
-        random_state=42,
-    )
+    return get_search(model=model, param_dist=dict(), n_iter=10)
 
 
 def get_model(name: str) -> RandomizedSearchCV:
     if name == "xgboost-regressor":
         return get_xgboost_regression()
+    elif name == "xgboost-categorical-regressor":
+        return get_xgboost_categorical_regression()
     elif name == "linear-regressor":
         return get_linear_regression()
     raise NotImplementedError(f"model provided doesn't exist {name}")
@@ -0,0 +1,55 @@
+"""duckdb connection pool."""
+
+import queue
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import duckdb
+from duckdb import DuckDBPyConnection
+
+
+class Pool:
+    """fixed size pool of read-only duckdb cursors shared by api threads."""
+
+    def __init__(self, database: str, size: int) -> None:
+        self.con = duckdb.connect(database=database, read_only=True)
+        self.cursors: queue.Queue[DuckDBPyConnection] = queue.Queue(maxsize=size)
+        for _ in range(size):
+            self.cursors.put(self.con.cursor())
+        self.lock = threading.Lock()
+        self.users = 0
+        self.retired = False
+
+    @contextmanager
+    def cursor(self) -> Iterator[DuckDBPyConnection]:
+        """borrow a cursor, blocking until one is available."""
+        con = self.cursors.get()
+        try:
+            yield con
+        finally:
+            self.cursors.put(con)
+
+    def acquire(self) -> None:
+        """count one more request using the pool."""
+        with self.lock:
+            self.users += 1
+
+    def release(self) -> None:
+        """count one request less, closing a retired pool left unused."""
+        with self.lock:
+            self.users -= 1
+            if self.retired and self.users == 0:
+                self.close()
+
+    def retire(self) -> None:
+        """close the pool once the requests using it release it."""
+        with self.lock:
+            self.retired = True
+            if self.users == 0:
+                self.close()
+
+    def close(self) -> None:
+        while self.cursors.empty() is False:
+            self.cursors.get_nowait().close()
+        self.con.close()
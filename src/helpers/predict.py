@@ -1,60 +1,213 @@
+import asyncio
 from datetime import datetime
+from typing import TYPE_CHECKING
+from collections.abc import Awaitable, Callable
 
+import numpy
+import orjson
 import pandas
-from sklearn.pipeline import Pipeline
 from duckdb import DuckDBPyConnection
 
-from api.models.output import Output
-from api.models.inputs import Inputs
-from api.models.outputs import Outputs
+import sql
+import helpers.timer
+from helpers.cache import Cache
+from helpers.intervals import Intervals
 
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
 
-def get_features(con: DuckDBPyConnection, skus: list[str]) -> pandas.DataFrame:
-    current_datetime = datetime.now()
-    current_date_str = current_datetime.strftime("%Y-%m-%d %H:%M:%S")
-
-    skus_str = ",".join([f"'{sku}'" for sku in skus])
-    query = (
-        open("sql/set_skus_features.sql")
-        .read()
-        .format(
-            skus_str=skus_str,
-            current_date_str=current_date_str,
-        )
+COLUMNS = ["sku", "date", "quantity_sold_min", "quantity_sold_max"]
+LAGS = [f"quantity_sold_lag_{lag}" for lag in range(1, 8)]
+
+
+def get_date_features(dates: pandas.DatetimeIndex) -> dict:
+    """compute date features with the same semantics as duckdb `EXTRACT`."""
+    day_of_week = ((dates.dayofweek + 1) % 7).to_numpy(dtype=numpy.int64)
+    return {
+        "dt_submitted": dates,
+        "day": dates.day.to_numpy(dtype=numpy.int64),
+        "year": dates.year.to_numpy(dtype=numpy.int64),
+        "month": dates.month.to_numpy(dtype=numpy.int64),
+        "day_of_week": day_of_week,
+        "day_of_year": dates.dayofyear.to_numpy(dtype=numpy.int64),
+        "week_of_year": dates.isocalendar().week.to_numpy(dtype=numpy.int64),
+        "is_weekend": day_of_week >= 5,
+    }
+
+
+def get_next_features(
+    features: pandas.DataFrame, outputs: numpy.ndarray
+) -> pandas.DataFrame:
+    """features of the next day, the predictions become the latest quantities.
+
+    Lags shift by one day and the rolling mean slides over the predictions,
+    windows of skus with less than 7 days of history count missing days as 0.
+    """
+    outputs = numpy.maximum(outputs, 0)
+    lags = {lag: features[previous].to_numpy() for previous, lag in zip(LAGS, LAGS[1:])}
+    rolling_mean_7 = features["rolling_mean_7"].to_numpy() + (
+        (outputs - features["quantity_sold_lag_7"].to_numpy()) / 7
+    )
+    return features.assign(
+        **lags, quantity_sold_lag_1=outputs, rolling_mean_7=rolling_mean_7
     )
 
-    return con.execute(query).fetchdf().sort_values(by="sku")
+
+def get_features(con: DuckDBPyConnection, skus: list[str]) -> pandas.DataFrame:
+    """lookup latest features in duckdb, skus are bound as a list parameter."""
+    return con.execute(
+        sql.get_query(name="set_skus_features"),
+        parameters={"skus": skus},
+    ).fetchdf()
+
+
+def get_index_features(index: pandas.DataFrame, skus: list[str]) -> pandas.DataFrame:
+    """lookup latest features in the in-memory sku index."""
+    positions = index.index.get_indexer(sorted(set(skus)))
+    return index.iloc[positions[positions >= 0]].reset_index()
 
 
 def get_prediction(
-    model: Pipeline, con: DuckDBPyConnection, metrics: dict, inputs: Inputs
-) -> Outputs:
-    skus = sorted(inputs.skus)
+    model: "Pipeline",
+    features: pandas.DataFrame,
+    metrics: dict,
+    skus: list[str],
+    horizon: int = 1,
+    intervals: Intervals | None = None,
+) -> pandas.DataFrame:
+    """compute daily prediction intervals of every requested sku.
 
-    features = get_features(
-        con=con,
-        skus=skus,
-    )
+    Days of the horizon are predicted recursively, one model call over all
+    skus per day whose predictions feed the lags of the next day. Intervals
+    are the residual quantiles of each sku when evaluate computed them, the
+    global mae band otherwise. Skus without features get a single row with
+    null date and NaN intervals.
+    """
+    predictions = pandas.DataFrame(data={"sku": sorted(set(skus))})
     if len(features) == 0:
-        return Outputs(
-            value=[
-                Output(sku=sku, quantity_sold_min=None, quantity_sold_max=None)
-                for sku in inputs.skus
-            ]
+        return predictions.assign(
+            date=None, quantity_sold_min=numpy.nan, quantity_sold_max=numpy.nan
         )
 
-    outputs = model.predict(X=features)
-    outputs = [
-        (
-            max(0, int(output - metrics["mae"])),
-            int(output + metrics["mae"]),
+    dates = pandas.date_range(start=datetime.now(), periods=horizon, freq="D")
+    date_features = get_date_features(dates=dates)
+    outputs = numpy.empty(shape=(len(features), horizon), dtype=numpy.float64)
+    x = features
+    for day in range(horizon):
+        x = x.assign(**{name: values[day] for name, values in date_features.items()})
+        with helpers.timer.timer(stage="inference"):
+            outputs[:, day] = numpy.ravel(model.predict(X=x))
+        if day < horizon - 1:
+            x = get_next_features(features=x, outputs=outputs[:, day])
+
+    with helpers.timer.timer(stage="postprocess"):
+        skus_rows = numpy.repeat(features["sku"].to_numpy(), horizon)
+        outputs = outputs.ravel()
+        if intervals is None:
+            low, high = -metrics["mae"], metrics["mae"]
+        else:
+            bounds = intervals.get_bounds(skus=skus_rows)
+            low, high = bounds[:, 0], bounds[:, 1]
+        rows = pandas.DataFrame(
+            data={
+                "sku": skus_rows,
+                "date": numpy.tile(dates.strftime("%Y-%m-%d"), len(features)),
+                "quantity_sold_min": numpy.trunc(numpy.maximum(outputs + low, 0)),
+                # adding 0 turns the -0.0 of truncated (-1, 0) values into 0
+                "quantity_sold_max": numpy.trunc(outputs + high) + 0.0,
+            }
         )
-        for output in outputs
-    ]
+        return predictions.merge(rows, on="sku", how="left")
+
 
-    return Outputs(
-        value=[
-            Output(sku=sku, quantity_sold_min=output[0], quantity_sold_max=output[1])
-            for sku, output in zip(inputs.skus, outputs)
-        ]
+def get_cached_rows(
+    cache: Cache, key: tuple, skus: list[str]
+) -> tuple[pandas.DataFrame, list[str]]:
+    """cached rows of `skus` as one frame, and the skus missing from the cache."""
+    keys = [(sku, *key) for sku in skus]
+    hits = cache.get_many(keys=keys)
+    misses = [sku for sku, item in zip(skus, keys) if item not in hits]
+    if len(hits) == 0:
+        return pandas.DataFrame(columns=COLUMNS), misses
+
+    arrays = zip(*hits.values())
+    rows = {
+        column: numpy.concatenate(list(values))
+        for column, values in zip(COLUMNS, arrays)
+    }
+    return pandas.DataFrame(data=rows), misses
+
+
+def set_cached_rows(cache: Cache, key: tuple, predictions: pandas.DataFrame) -> None:
+    """cache the rows of every sku as column arrays, `predictions` are sorted by sku."""
+    arrays = [predictions[column].to_numpy() for column in COLUMNS]
+    skus = arrays[0]
+    bounds = numpy.flatnonzero(skus[1:] != skus[:-1]) + 1
+    starts, ends = [0, *bounds.tolist()], [*bounds.tolist(), len(skus)]
+    cache.set_many(
+        values={
+            (skus[start], *key): tuple(array[start:end] for array in arrays)
+            for start, end in zip(starts, ends)
+        }
+    )
+
+
+def get_merged_prediction(
+    cache: Cache, key: tuple, hits: pandas.DataFrame, predictions: pandas.DataFrame
+) -> pandas.DataFrame:
+    """cache new predictions unless they would evict the whole cache, then add hits."""
+    if predictions["sku"].nunique() <= cache.max_size:
+        set_cached_rows(cache=cache, key=key, predictions=predictions)
+    if len(hits) == 0:
+        return predictions
+    return (
+        pandas.concat([hits, predictions], ignore_index=True)
+        .sort_values(by="sku", kind="stable")
+        .reset_index(drop=True)
     )
+
+
+async def get_cached_prediction(
+    cache: Cache,
+    key: tuple,
+    skus: list[str],
+    predict: Callable[[list[str]], Awaitable[pandas.DataFrame]],
+) -> pandas.DataFrame:
+    """predict only the skus missing from the cache, then cache their rows.
+
+    Rows of a sku are cached together as column arrays under `(sku, *key)`,
+    the key holding everything the prediction depends on besides the sku.
+    A disabled cache is skipped, cache lookups and merges run in a thread.
+    """
+    if cache.max_size == 0:
+        return await predict(skus)
+
+    skus = sorted(set(skus))
+    hits, misses = await asyncio.to_thread(get_cached_rows, cache, key, skus)
+    if len(misses) == 0:
+        return hits
+    predictions = await predict(misses)
+    return await asyncio.to_thread(get_merged_prediction, cache, key, hits, predictions)
+
+
+def get_records(predictions: pandas.DataFrame) -> list[dict]:
+    """predictions columns as a list of `Output` dicts."""
+    return [
+        {
+            "sku": sku,
+            "date": date,
+            "quantity_sold_min": low,
+            "quantity_sold_max": high,
+        }
+        for sku, date, low, high in zip(
+            predictions["sku"].tolist(),
+            predictions["date"].tolist(),
+            predictions["quantity_sold_min"].tolist(),
+            predictions["quantity_sold_max"].tolist(),
+        )
+    ]
+
+
+def get_content(predictions: pandas.DataFrame) -> bytes:
+    """serialize predictions columns to a json list of `Output`, NaN become null."""
+    return orjson.dumps(get_records(predictions=predictions))
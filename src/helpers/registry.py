@@ -0,0 +1,77 @@
+"""registry of the trained models."""
+
+import os
+import logging
+import threading
+from typing import Any
+from collections import OrderedDict
+from collections.abc import Callable
+
+import helpers.download
+
+
+class Registry:
+    """models loaded on first use, least recently used ones are evicted once
+    their files weigh more than `max_bytes`."""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        load: Callable[[str, str], Any],
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.load = load
+        self.size = 0
+        self.lock = threading.Lock()
+        self.items: OrderedDict[tuple[str, str], tuple[int, Any]] = OrderedDict()
+
+    def list(self) -> list[tuple[str, str]]:
+        """`(model_name, exec_date)` of every trained and evaluated model."""
+        folder_path = os.path.join(self.cache_dir, "models")
+        if os.path.exists(folder_path) is False:
+            return list()
+        return [
+            (model_name, exec_date)
+            for model_name in sorted(
+                name.removeprefix("model=")
+                for name in os.listdir(folder_path)
+                if name.startswith("model=")
+            )
+            for exec_date in helpers.download.get_exec_dates(
+                cache_dir=self.cache_dir, model_name=model_name
+            )
+        ]
+
+    def get_size(self, model_name: str, exec_date: str) -> int:
+        folder_path = os.path.join(
+            self.cache_dir, f"models/model={model_name}/exec_date={exec_date}"
+        )
+        return sum(entry.stat().st_size for entry in os.scandir(folder_path))
+
+    def is_loaded(self, model_name: str, exec_date: str) -> bool:
+        with self.lock:
+            return (model_name, exec_date) in self.items
+
+    def get(self, model_name: str, exec_date: str) -> Any:
+        """return a loaded model, loading it outside of the lock on a miss."""
+        key = (model_name, exec_date)
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key][1]
+
+        logging.info(f"load model {model_name} {exec_date}")
+        value = self.load(model_name, exec_date)
+        size = self.get_size(model_name=model_name, exec_date=exec_date)
+        with self.lock:
+            if key not in self.items:
+                self.items[key] = (size, value)
+                self.size += size
+            self.items.move_to_end(key)
+            while self.size > self.max_bytes and len(self.items) > 1:
+                (name, date), (evicted, _) = self.items.popitem(last=False)
+                self.size -= evicted
+                logging.info(f"evict model {name} {date}")
+            return self.items[key][1]
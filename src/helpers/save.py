@@ -1,43 +1,126 @@
 import os
 import json
+import shutil
 import logging
-from typing import Literal
+from typing import Literal, TYPE_CHECKING
 from datetime import datetime, UTC
 
-import joblib
-import pandas
-from sklearn.pipeline import Pipeline
+import numpy
+from duckdb import DuckDBPyConnection
+
+if TYPE_CHECKING:
+    import pandas
+    from sklearn.pipeline import Pipeline
+
+    from helpers.segmented import Segmented
+
+CODECS = {
+    "lz4": "lz4",
+    "zstd": "zstd",
+    "gzip": "gzip",
+    "snappy": "snappy",
+    "none": "uncompressed",
+}
+
+
+def get_exec_date() -> str:
+    return datetime.now(UTC).strftime("%Y-%m-%d-%H-%M-%S")
 
 
 def save_item(
+    part: str,
+    codec: str,
     cache_dir: str,
-    x: pandas.DataFrame,
+    incremental: bool,
+    row_group_size: int,
+    con: DuckDBPyConnection,
     type_: Literal["train", "test"],
 ) -> None:
     folder_path = os.path.join(cache_dir, f"datasets/type={type_}")
+    if incremental is False:
+        shutil.rmtree(folder_path, ignore_errors=True)
     os.makedirs(folder_path, exist_ok=True)
 
-    file_path = os.path.join(folder_path, "result.parquet")
-    logging.info(f"save dataset to {file_path}")
+    logging.info(f"save dataset to {folder_path}/year=*/result-{part}-*.parquet")
 
-    x.to_parquet(
-        path=file_path,
-        compression="gzip",
-        engine="pyarrow",
+    con.execute(
+        f"""
+        COPY (
+            SELECT * EXCLUDE (is_test) FROM split
+            WHERE is_test = {type_ == "test"}
+            ORDER BY sku, dt_submitted
+        ) TO '{folder_path}' (
+            FORMAT PARQUET,
+            COMPRESSION {codec},
+            ROW_GROUP_SIZE {int(row_group_size)},
+            PARTITION_BY (year),
+            OVERWRITE_OR_IGNORE,
+            FILENAME_PATTERN 'result-{part}-{{i}}'
+        )
+        """
     )
 
 
 def save_data(
+    codec: str,
     cache_dir: str,
-    df_test: pandas.DataFrame,
-    df_train: pandas.DataFrame,
+    incremental: bool,
+    row_group_size: int,
+    con: DuckDBPyConnection,
 ) -> None:
-    save_item(cache_dir=cache_dir, x=df_test, type_="test")
-    save_item(cache_dir=cache_dir, x=df_train, type_="train")
+    """write split rows, a full run replaces all parts, an incremental one adds one."""
+    if codec not in CODECS:
+        raise ValueError(f"codec provided doesn't exist {codec}")
+
+    part = get_exec_date()
+    types: tuple[Literal["train", "test"], ...] = ("test", "train")
+    for type_ in types:
+        save_item(
+            con=con,
+            part=part,
+            type_=type_,
+            cache_dir=cache_dir,
+            codec=CODECS[codec],
+            incremental=incremental,
+            row_group_size=row_group_size,
+        )
 
 
-def save_model(cache_dir: str, model_name: str, model: Pipeline) -> None:
-    exec_date = datetime.now(UTC).strftime("%Y-%m-%d-%H-%M-%S")
+def save_booster(folder_path: str, model: "Pipeline") -> None:
+    """export the booster, the sorted skus of the sku encoder and metadata."""
+    from sklearn.preprocessing import OrdinalEncoder
+
+    preprocessor = model.named_steps["preprocessor"]
+    columns = {name: columns for name, _, columns in preprocessor.transformers_}
+    encoder = preprocessor.named_transformers_["cat"]
+
+    file_path = os.path.join(folder_path, "booster.ubj")
+    logging.info(f"save booster to {file_path}")
+    model.named_steps["regressor"].get_booster().save_model(file_path)
+    numpy.save(
+        file=os.path.join(folder_path, "skus.npy"),
+        arr=encoder.categories_[0].astype(str),
+    )
+    with open(os.path.join(folder_path, "booster.json"), mode="w") as f:
+        json.dump(
+            {
+                "features": list(columns["num"]),
+                "sparse_output": bool(preprocessor.sparse_output_),
+                "encoding": "ordinal"
+                if isinstance(encoder, OrdinalEncoder)
+                else "onehot",
+            },
+            f,
+        )
+
+
+def save_model(cache_dir: str, model_name: str, model: "Pipeline | Segmented") -> str:
+    """scikit-learn and xgboost are imported here, preparing data needs neither."""
+    import joblib
+    from xgboost import XGBRegressor
+    from sklearn.pipeline import Pipeline
+
+    exec_date = get_exec_date()
     folder_path = os.path.join(
         cache_dir, f"models/model={model_name}/exec_date={exec_date}"
     )
@@ -46,6 +129,12 @@ def save_model(cache_dir: str, model_name: str, model: Pipeline) -> None:
     logging.info(f"save model to {file_path}")
     joblib.dump(value=model, filename=file_path)
 
+    if isinstance(model, Pipeline) and isinstance(
+        model.named_steps["regressor"], XGBRegressor
+    ):
+        save_booster(folder_path=folder_path, model=model)
+    return exec_date
+
 
 def save_metrics(
     x: dict,
@@ -64,15 +153,53 @@ def save_metrics(
         json.dump(x, f)
 
 
+def save_intervals(
+    x: dict,
+    cache_dir: str,
+    exec_date: str,
+    model_name: str,
+) -> None:
+    """save the sorted skus, their residual quantiles and the global ones."""
+    folder_path = os.path.join(
+        cache_dir, f"metrics/model={model_name}/exec_date={exec_date}"
+    )
+    os.makedirs(folder_path, exist_ok=True)
+
+    file_path = os.path.join(folder_path, "intervals.npy")
+    logging.info(f"save intervals to {file_path}")
+    numpy.save(file=file_path, arr=x["bounds"].astype(numpy.float32))
+    numpy.save(file=os.path.join(folder_path, "interval_skus.npy"), arr=x["skus"])
+    with open(os.path.join(folder_path, "intervals.json"), mode="w") as f:
+        json.dump({"coverage": x["coverage"], "default": x["default"].tolist()}, f)
+
+
+def save_breakdown(
+    cache_dir: str,
+    exec_date: str,
+    x: "pandas.DataFrame",
+) -> None:
+    folder_path = os.path.join(cache_dir, f"breakdowns/exec_date={exec_date}")
+    os.makedirs(folder_path, exist_ok=True)
+
+    file_path = os.path.join(folder_path, "result.parquet")
+    logging.info(f"save breakdown to {file_path}")
+    x.to_parquet(
+        path=file_path,
+        compression="zstd",
+        engine="pyarrow",
+    )
+
+
 def save_results(
+    part: int,
     cache_dir: str,
-    x: pandas.DataFrame,
+    exec_date: str,
+    x: "pandas.DataFrame",
 ) -> None:
-    exec_date = datetime.now(UTC).strftime("%Y-%m-%d-%H-%M-%S")
     folder_path = os.path.join(cache_dir, f"results/exec_date={exec_date}")
     os.makedirs(folder_path, exist_ok=True)
 
-    file_path = os.path.join(folder_path, "result.parquet")
+    file_path = os.path.join(folder_path, f"result-{part:05d}.parquet")
     logging.info(f"save results to {file_path}")
     x.to_parquet(
         path=file_path,
@@ -0,0 +1,46 @@
+"""models trained per segment of skus."""
+
+from typing import TYPE_CHECKING
+
+import numpy
+import pandas
+
+from helpers.skus import get_positions
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+
+class Segmented:
+    """predict like a single model, each sku is routed to the model of its segment.
+
+    Skus are sorted with the segment of each one, unknown skus and skus of a
+    segment without model go to the `default` segment.
+    """
+
+    def __init__(
+        self,
+        skus: numpy.ndarray,
+        segments: numpy.ndarray,
+        models: dict[int, "Pipeline"],
+        default: int,
+    ) -> None:
+        self.skus = skus
+        self.models = models
+        self.default = default
+        self.segments = numpy.where(
+            numpy.isin(segments, list(models)), segments, default
+        )
+
+    def get_segments(self, skus: numpy.ndarray) -> numpy.ndarray:
+        positions, known = get_positions(sorted_skus=self.skus, skus=skus)
+        return numpy.where(known, self.segments[positions], self.default)
+
+    def predict(self, X: pandas.DataFrame) -> numpy.ndarray:
+        """one prediction per segment present in `X`, scattered back in order."""
+        segments = self.get_segments(skus=X["sku"].to_numpy())
+        output = numpy.empty(len(X), dtype=numpy.float64)
+        for segment in numpy.unique(segments):
+            rows = numpy.flatnonzero(segments == segment)
+            output[rows] = numpy.ravel(self.models[segment].predict(X=X.iloc[rows]))
+        return output
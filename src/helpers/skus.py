@@ -0,0 +1,19 @@
+"""lookup of skus in the sorted skus of a model."""
+
+import numpy
+
+
+def get_positions(
+    sorted_skus: numpy.ndarray, skus: numpy.ndarray
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """position of every sku in `sorted_skus` and whether it is known there.
+
+    Positions of unknown skus are valid indexes of `sorted_skus` but
+    meaningless, they have to be masked with `known`.
+    """
+    skus = numpy.asarray(skus, dtype=str)
+    if len(sorted_skus) == 0:
+        return numpy.zeros(len(skus), dtype=numpy.intp), numpy.zeros(len(skus), bool)
+    positions = numpy.searchsorted(sorted_skus, skus)
+    positions = numpy.minimum(positions, len(sorted_skus) - 1)
+    return positions, sorted_skus[positions] == skus
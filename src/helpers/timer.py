@@ -0,0 +1,79 @@
+"""stage timings and request sizes."""
+
+import time
+import bisect
+import logging
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import orjson
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SKUS = (1, 5, 10, 50, 100, 500, 1_000, 5_000, 10_000)
+
+
+class Histogram:
+    """thread-safe cumulative histogram in the prometheus format."""
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def get_lines(self, name: str, labels: str = "") -> list[str]:
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        prefix = f"{labels}," if len(labels) > 0 else ""
+        lines, count = list(), 0
+        for bucket, bucket_count in zip([*self.buckets, "+Inf"], counts):
+            count += bucket_count
+            lines.append(f'{name}_bucket{{{prefix}le="{bucket}"}} {count}')
+        labels = f"{{{labels}}}" if len(labels) > 0 else ""
+        lines.append(f"{name}_sum{labels} {total}")
+        lines.append(f"{name}_count{labels} {count}")
+        return lines
+
+
+lock = threading.Lock()
+stages: dict[str, Histogram] = dict()
+skus = Histogram(buckets=SKUS)
+
+
+def observe(stage: str, seconds: float) -> None:
+    with lock:
+        if stage not in stages:
+            stages[stage] = Histogram(buckets=SECONDS)
+    stages[stage].observe(value=seconds)
+
+
+@contextmanager
+def timer(stage: str, log: bool = False, **fields) -> Iterator[None]:
+    """time a stage into its histogram, `log` emits it as a json log line too."""
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    observe(stage=stage, seconds=seconds)
+    if log:
+        line = {"stage": stage, "seconds": round(seconds, 6), **fields}
+        logging.info(orjson.dumps(line).decode())
+
+
+def get_content() -> str:
+    """render histograms in the prometheus text format."""
+    lines = ["# TYPE stage_seconds histogram"]
+    with lock:
+        items = sorted(stages.items())
+    for stage, histogram in items:
+        lines.extend(
+            histogram.get_lines(name="stage_seconds", labels=f'stage="{stage}"')
+        )
+    lines.append("# TYPE request_skus histogram")
+    lines.extend(skus.get_lines(name="request_skus"))
+    return "\n".join(lines) + "\n"
@@ -2,54 +2,117 @@
 
 from typing import Annotated
 
-from typer import Typer, Argument
+from typer import Typer, Option, Argument, Context
 
-import tasks.train
-import tasks.expose
-import tasks.prepare
-import tasks.predict
-import tasks.evaluate
-
-import helpers.save
-import helpers.model
 import helpers.logger
-import helpers.download
+import helpers.imports
 
 
 app = Typer(name="inventory-planning")
 
 
+@app.callback()
+def main(
+    context: Context,
+    import_time: Annotated[bool, Option(envvar="IMPORT_TIME")] = False,
+) -> None:
+    """Inventory planning, each command imports only the tasks it runs."""
+    if import_time:
+        helpers.imports.init()
+        context.call_on_close(helpers.imports.report)
+
+
 @app.command(name="prepare")
 def prepare(
     cache_dir: Annotated[str, Argument(envvar="CACHE_DIR")],
+    seed: Annotated[int, Option(envvar="SEED")] = 42,
+    incremental: Annotated[bool, Option(envvar="INCREMENTAL")] = False,
+    codec: Annotated[str, Option(envvar="PARQUET_CODEC")] = "zstd",
+    row_group_size: Annotated[int, Option(envvar="PARQUET_ROW_GROUP_SIZE")] = 122_880,
+    memory_limit: Annotated[str, Option(envvar="DUCKDB_MEMORY_LIMIT")] = "",
+    threads: Annotated[int, Option(envvar="DUCKDB_THREADS")] = 0,
 ) -> None:
+    import tasks.prepare
+    import helpers.save
+    import helpers.timer
+
     helpers.logger.init()
-    _, df_train, df_test = tasks.prepare.get_data(cache_dir=cache_dir)
-    helpers.save.save_data(
-        df_test=df_test,
-        df_train=df_train,
-        cache_dir=cache_dir,
+    con = tasks.prepare.get_db(
+        cache_dir=cache_dir, memory_limit=memory_limit, threads=threads
     )
+    incremental = incremental and tasks.prepare.has_raw_table(con=con)
+    with helpers.timer.timer(stage="prepare.data", log=True, incremental=incremental):
+        if incremental:
+            tasks.prepare.set_new_data(con=con, cache_dir=cache_dir, seed=seed)
+        else:
+            tasks.prepare.set_data(con=con, cache_dir=cache_dir, seed=seed)
+    with helpers.timer.timer(stage="prepare.save", log=True, codec=codec):
+        helpers.save.save_data(
+            con=con,
+            codec=codec,
+            cache_dir=cache_dir,
+            incremental=incremental,
+            row_group_size=row_group_size,
+        )
 
 
 @app.command(name="train")
 def train(
     cache_dir: Annotated[str, Argument(envvar="CACHE_DIR")],
     model_name: Annotated[str, Argument(envvar="MODEL_NAME")],
+    search: Annotated[str, Option(envvar="SEARCH")] = "random",
+    factor: Annotated[int, Option(envvar="SEARCH_FACTOR")] = 3,
+    budget: Annotated[float, Option(envvar="SEARCH_BUDGET")] = 0,
+    max_fits: Annotated[int, Option(envvar="SEARCH_MAX_FITS")] = 0,
+    early_stopping_rounds: Annotated[int, Option(envvar="EARLY_STOPPING_ROUNDS")] = 20,
+    segments: Annotated[int, Option(envvar="SEGMENTS")] = 0,
+    segment_by: Annotated[str, Option(envvar="SEGMENT_BY")] = "hash",
+    workers: Annotated[int, Option(envvar="WORKERS")] = 1,
 ) -> None:
+    import tasks.train
+    import helpers.save
+    import helpers.model
+    import helpers.timer
+    import helpers.download
+
     helpers.logger.init()
-    x_train, y_train = helpers.download.get_train_data(cache_dir=cache_dir)
+    with helpers.timer.timer(stage="train.download", log=True):
+        x_train, y_train = helpers.download.get_train_data(cache_dir=cache_dir)
     grid_search = helpers.model.get_model(name=model_name)
-    model = tasks.train.train(
-        y_train=y_train,
-        x_train=x_train,
-        grid_search=grid_search,
-    )
-    helpers.save.save_model(
-        model=model,
-        cache_dir=cache_dir,
-        model_name=model_name,
-    )
+    with helpers.timer.timer(stage="train.search", log=True, rows=len(x_train)):
+        if segments > 0:
+            model = tasks.train.train_segments(
+                workers=workers,
+                y_train=y_train,
+                x_train=x_train,
+                segments=segments,
+                model_name=model_name,
+                segment_by=segment_by,
+            )
+        elif search == "halving":
+            model = tasks.train.train_halving(
+                budget=budget,
+                factor=factor,
+                y_train=y_train,
+                x_train=x_train,
+                max_fits=max_fits,
+                grid_search=grid_search,
+                early_stopping_rounds=early_stopping_rounds,
+            )
+        elif search == "random":
+            model = tasks.train.train(
+                y_train=y_train,
+                x_train=x_train,
+                grid_search=grid_search,
+            )
+        else:
+            raise NotImplementedError(f"search provided doesn't exist {search}")
+    with helpers.timer.timer(stage="train.save", log=True):
+        helpers.save.save_model(
+            model=model,
+            cache_dir=cache_dir,
+            model_name=model_name,
+        )
 
 
 @app.command(name="evaluate")
@@ -57,25 +120,60 @@ def evaluate(
     exec_date: Annotated[str, Argument(envvar="EXEC_DATE")],
     cache_dir: Annotated[str, Argument(envvar="CACHE_DIR")],
     model_name: Annotated[str, Argument(envvar="MODEL_NAME")],
+    batch_size: Annotated[int, Option(envvar="BATCH_SIZE")] = 1_000_000,
+    compare: Annotated[list[str], Option(envvar="COMPARE")] = [],
+    coverage: Annotated[float, Option(envvar="INTERVAL_COVERAGE")] = 0.8,
 ) -> None:
-    helpers.logger.init()
+    import tasks.evaluate
+    import helpers.save
+    import helpers.timer
+    import helpers.download
 
-    x_test, y_test = helpers.download.get_test_data(cache_dir=cache_dir)
-    model = helpers.download.get_model(
-        exec_date=exec_date,
+    helpers.logger.init()
+    keys = [(model_name, exec_date)]
+    for item in compare:
+        if item.count(":") != 1:
+            raise ValueError(f"Model provided isn't <model_name>:<exec_date> {item}")
+        name, date = item.split(":")
+        keys.append((name, date))
+
+    batches = helpers.download.get_batches(
+        type_="test",
         cache_dir=cache_dir,
-        model_name=model_name,
+        batch_size=batch_size,
     )
-    metrics = tasks.evaluate.evaluate(
-        model=model,
-        x_test=x_test,
-        y_test=y_test,
-    )
-    helpers.save.save_metrics(
-        x=metrics,
+    with helpers.timer.timer(stage="evaluate.model", log=True, models=len(keys)):
+        models = {
+            (name, date): helpers.download.get_model(
+                exec_date=date,
+                cache_dir=cache_dir,
+                model_name=name,
+            )
+            for name, date in dict.fromkeys(keys)
+        }
+    with helpers.timer.timer(stage="evaluate.score", log=True, models=len(models)):
+        metrics, intervals, breakdown = tasks.evaluate.evaluate(
+            models=models,
+            batches=batches,
+            coverage=coverage,
+        )
+    for name, date in models:
+        helpers.save.save_metrics(
+            x=metrics[(name, date)],
+            cache_dir=cache_dir,
+            exec_date=date,
+            model_name=name,
+        )
+        helpers.save.save_intervals(
+            x=intervals[(name, date)],
+            cache_dir=cache_dir,
+            exec_date=date,
+            model_name=name,
+        )
+    helpers.save.save_breakdown(
+        x=breakdown,
         cache_dir=cache_dir,
-        exec_date=exec_date,
-        model_name=model_name,
+        exec_date=helpers.save.get_exec_date(),
     )
 
 
@@ -84,28 +182,51 @@ def predict(
     exec_date: Annotated[str, Argument(envvar="EXEC_DATE")],
     cache_dir: Annotated[str, Argument(envvar="CACHE_DIR")],
     model_name: Annotated[str, Argument(envvar="MODEL_NAME")],
+    workers: Annotated[int, Option(envvar="WORKERS")] = 1,
+    horizon: Annotated[int, Option(envvar="HORIZON")] = 1,
+    chunk_size: Annotated[int, Option(envvar="CHUNK_SIZE")] = 100_000,
 ) -> None:
+    import tasks.predict
+    import helpers.timer
+
     helpers.logger.init()
-    con = helpers.download.get_db(cache_dir=cache_dir)
-    model = helpers.download.get_model(
-        exec_date=exec_date,
-        cache_dir=cache_dir,
-        model_name=model_name,
-    )
-    metrics = helpers.download.get_metrics(
+    with helpers.timer.timer(stage="predict", log=True, workers=workers):
+        tasks.predict.save_predictions(
+            workers=workers,
+            horizon=horizon,
+            exec_date=exec_date,
+            cache_dir=cache_dir,
+            chunk_size=chunk_size,
+            model_name=model_name,
+        )
+
+
+@app.command(name="bench")
+def bench(
+    cache_dir: Annotated[str, Argument(envvar="BENCH_DIR")],
+    model_name: Annotated[str, Option(envvar="MODEL_NAME")] = "linear-regressor",
+    skus: Annotated[int, Option(envvar="BENCH_SKUS")] = 1_000,
+    days: Annotated[int, Option(envvar="BENCH_DAYS")] = 365,
+    seed: Annotated[int, Option(envvar="SEED")] = 42,
+    batch_sizes: Annotated[list[int], Option()] = [1, 10, 100],
+    concurrencies: Annotated[list[int], Option()] = [1, 8, 32],
+    requests: Annotated[int, Option(envvar="BENCH_REQUESTS")] = 200,
+    output: Annotated[str, Option(envvar="BENCH_OUTPUT")] = "bench.json",
+) -> None:
+    import tasks.bench
+
+    helpers.logger.init()
+    results = tasks.bench.bench(
+        days=days,
+        seed=seed,
+        skus=skus,
+        requests=requests,
         cache_dir=cache_dir,
-        exec_date=exec_date,
         model_name=model_name,
+        batch_sizes=batch_sizes,
+        concurrencies=concurrencies,
     )
-    results = tasks.predict.get_predictions(
-        con=con,
-        model=model,
-        metrics=metrics,
-    )
-    helpers.save.save_results(
-        x=results,
-        cache_dir=cache_dir,
-    )
+    tasks.bench.save_results(results=results, file_path=output)
 
 
 @app.command(name="expose")
@@ -114,6 +235,8 @@ def expose(
     cache_dir: Annotated[str, Argument(envvar="CACHE_DIR")],
     model_name: Annotated[str, Argument(envvar="MODEL_NAME")],
 ) -> None:
+    import tasks.expose
+
     helpers.logger.init()
     tasks.expose.run_api()
 
@@ -1 +1,11 @@
 """Duckdb sql queries"""
+
+import os
+from functools import cache
+
+
+@cache
+def get_query(name: str) -> str:
+    """read a sql query from this folder once."""
+    with open(os.path.join(os.path.dirname(__file__), f"{name}.sql")) as f:
+        return f.read()
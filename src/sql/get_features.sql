@@ -1,4 +1,3 @@
-CREATE OR REPLACE TABLE features AS 
 SELECT 
     sku,
     dt_submitted,
@@ -20,4 +19,4 @@ SELECT
         ORDER BY dt_submitted 
         ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
     ), 0) AS rolling_mean_7
-FROM data
+FROM {table}
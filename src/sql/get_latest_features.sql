@@ -0,0 +1,16 @@
+SELECT
+    sku,
+    quantity_sold AS quantity_sold_lag_1,
+    COALESCE(LAG(quantity_sold, 1) OVER (PARTITION BY sku ORDER BY dt_submitted), 0) AS quantity_sold_lag_2,
+    COALESCE(LAG(quantity_sold, 2) OVER (PARTITION BY sku ORDER BY dt_submitted), 0) AS quantity_sold_lag_3,
+    COALESCE(LAG(quantity_sold, 3) OVER (PARTITION BY sku ORDER BY dt_submitted), 0) AS quantity_sold_lag_4,
+    COALESCE(LAG(quantity_sold, 4) OVER (PARTITION BY sku ORDER BY dt_submitted), 0) AS quantity_sold_lag_5,
+    COALESCE(LAG(quantity_sold, 5) OVER (PARTITION BY sku ORDER BY dt_submitted), 0) AS quantity_sold_lag_6,
+    COALESCE(LAG(quantity_sold, 6) OVER (PARTITION BY sku ORDER BY dt_submitted), 0) AS quantity_sold_lag_7,
+    COALESCE(AVG(quantity_sold) OVER (
+        PARTITION BY sku
+        ORDER BY dt_submitted
+        ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+    ), 0) AS rolling_mean_7
+FROM {table}
+QUALIFY ROW_NUMBER() OVER (PARTITION BY sku ORDER BY dt_submitted DESC) = 1
@@ -0,0 +1,7 @@
+CREATE OR REPLACE TEMP VIEW split AS
+SELECT
+    features.*,
+    HASH(features.sku, features.dt_submitted, {seed}) % 5 = 0 AS is_test
+FROM features
+SEMI JOIN new_data
+ON features.sku = new_data.sku AND features.dt_submitted = new_data.dt_submitted
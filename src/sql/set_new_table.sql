@@ -0,0 +1,19 @@
+CREATE OR REPLACE TEMP TABLE new_data AS
+SELECT
+    raw.sku,
+    raw.dt_submitted,
+    raw.quantity_sold
+FROM (
+    SELECT
+        sku,
+        CAST(dt_submitted AS TIMESTAMP) AS dt_submitted,
+        quantity_sold
+    FROM read_parquet('{folder_path}/*/*/*.parquet', hive_partitioning = false)
+) AS raw
+LEFT JOIN (
+    SELECT sku, MAX(dt_submitted) AS dt_submitted
+    FROM data
+    GROUP BY sku
+) AS latest
+ON raw.sku = latest.sku
+WHERE latest.dt_submitted IS NULL OR raw.dt_submitted > latest.dt_submitted
@@ -0,0 +1,18 @@
+COPY (
+    SELECT
+        SKU AS sku,
+        DATE AS dt_submitted,
+        QUANTITY_SOLD AS quantity_sold,
+        YEAR(DATE) AS year,
+        MONTH(DATE) AS month
+    FROM read_csv(
+        '{file_path}',
+        header = true,
+        parallel = true,
+        columns = {{'SKU': 'VARCHAR', 'DATE': 'DATE', 'QUANTITY_SOLD': 'INTEGER'}}
+    )
+) TO '{folder_path}' (
+    FORMAT PARQUET,
+    COMPRESSION zstd,
+    PARTITION_BY (year, month)
+)
@@ -1,6 +1,6 @@
 CREATE OR REPLACE TABLE data AS 
 SELECT 
-    CAST(SKU AS STRING) AS sku, 
-    CAST(DATE AS TIMESTAMP) AS dt_submitted, 
-    CAST(QUANTITY_SOLD AS INT) AS quantity_sold
-FROM read_csv_auto('{file_path}')
+    sku, 
+    CAST(dt_submitted AS TIMESTAMP) AS dt_submitted, 
+    quantity_sold
+FROM read_parquet('{folder_path}/*/*/*.parquet', hive_partitioning = false)
@@ -0,0 +1,9 @@
+CREATE OR REPLACE TEMP VIEW split AS
+SELECT
+    *,
+    COUNT(*) OVER (PARTITION BY sku) > 1
+    AND ROW_NUMBER() OVER (
+        PARTITION BY sku
+        ORDER BY HASH(sku, dt_submitted, {seed})
+    ) <= CEIL(0.2 * COUNT(*) OVER (PARTITION BY sku)) AS is_test
+FROM features
@@ -0,0 +1,12 @@
+CREATE OR REPLACE TEMP TABLE tail AS
+SELECT sku, dt_submitted, quantity_sold
+FROM (
+    SELECT data.sku, data.dt_submitted, data.quantity_sold
+    FROM data
+    SEMI JOIN new_data
+    ON data.sku = new_data.sku
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY data.sku ORDER BY data.dt_submitted DESC) <= 7
+)
+UNION ALL
+SELECT sku, dt_submitted, quantity_sold
+FROM new_data
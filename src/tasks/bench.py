@@ -0,0 +1,225 @@
+"""benchmark the pipeline and the api on synthetic data."""
+
+import os
+import time
+import json
+import random
+import asyncio
+import logging
+import resource
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import httpx
+import numpy
+import pandas
+
+import tasks.train
+import tasks.expose
+import tasks.prepare
+import tasks.predict
+import tasks.evaluate
+
+import helpers.save
+import helpers.model
+import helpers.timer
+import helpers.download
+import helpers.lifespan
+
+
+@contextmanager
+def measure(stages: dict[str, float], stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    with helpers.timer.timer(stage=f"bench.{stage}", log=True):
+        yield
+    stages[stage] = time.perf_counter() - start
+
+
+def set_raw_file(cache_dir: str, skus: int, days: int, seed: int) -> str:
+    """write a sales csv of `skus` weekly seasonal series of `days` days."""
+    generator = numpy.random.default_rng(seed=seed)
+    folder_path = os.path.join(cache_dir, "datasets/type=raw")
+    os.makedirs(folder_path, exist_ok=True)
+    file_path = os.path.join(folder_path, "data.csv")
+
+    names = generator.integers(-(2**63), 2**63 - 1, size=skus, dtype=numpy.int64)
+    dates = pandas.date_range(start="2023-01-01", periods=days, freq="D")
+    levels = generator.gamma(shape=2.0, scale=5.0, size=(skus, 1))
+    season = 1 + 0.3 * numpy.sin(2 * numpy.pi * dates.dayofweek.to_numpy() / 7)
+    pandas.DataFrame(
+        data={
+            "SKU": numpy.repeat(names, days),
+            "DATE": numpy.tile(dates.strftime("%Y-%m-%d"), skus),
+            "QUANTITY_SOLD": generator.poisson(lam=levels * season).ravel(),
+        }
+    ).to_csv(file_path, index=False)
+    return file_path
+
+
+def get_latencies(latencies: list[float], elapsed: float, skus: int) -> dict:
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "skus_per_second": skus / elapsed,
+        "p50": float(numpy.percentile(latencies, 50)),
+        "p99": float(numpy.percentile(latencies, 99)),
+    }
+
+
+async def run_api(
+    skus: list[str], batch_sizes: list[int], concurrencies: list[int], requests: int
+) -> list[dict]:
+    """send `requests` requests of every batch size at every concurrency."""
+    api = tasks.expose.set_api()
+    headers = {"X-API-KEY": os.environ["API_KEY"]}
+    transport = httpx.ASGITransport(app=api)
+    results = list()
+    await helpers.lifespan.init()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for batch_size in batch_sizes:
+            for concurrency in concurrencies:
+                semaphore = asyncio.Semaphore(concurrency)
+                latencies = list()
+
+                async def send() -> None:
+                    body = {"skus": random.sample(skus, k=min(batch_size, len(skus)))}
+                    async with semaphore:
+                        start = time.perf_counter()
+                        r = await c.post("/predict", json=body, headers=headers)
+                        latencies.append(time.perf_counter() - start)
+                    r.raise_for_status()
+
+                start = time.perf_counter()
+                await asyncio.gather(*[send() for _ in range(requests)])
+                elapsed = time.perf_counter() - start
+                result = {"batch_size": batch_size, "concurrency": concurrency}
+                result |= get_latencies(
+                    latencies=latencies,
+                    elapsed=elapsed,
+                    skus=requests * min(batch_size, len(skus)),
+                )
+                logging.info(result)
+                results.append(result)
+    await helpers.lifespan.close()
+    return results
+
+
+def bench(
+    cache_dir: str,
+    model_name: str,
+    skus: int,
+    days: int,
+    seed: int,
+    batch_sizes: list[int],
+    concurrencies: list[int],
+    requests: int,
+) -> dict:
+    """run every stage on a synthetic dataset written under `cache_dir`.
+
+    The api is driven in-process with the predictions cache disabled, so
+    repeated skus are predicted every time.
+    """
+    random.seed(seed)
+    stages: dict[str, float] = dict()
+    with measure(stages=stages, stage="generate"):
+        set_raw_file(cache_dir=cache_dir, skus=skus, days=days, seed=seed)
+
+    con = tasks.prepare.get_db(cache_dir=cache_dir)
+    with measure(stages=stages, stage="ingest"):
+        folder_path = tasks.prepare.get_raw_dataset(con=con, cache_dir=cache_dir)
+    with measure(stages=stages, stage="raw_load"):
+        tasks.prepare.set_raw_table(con=con, folder_path=folder_path)
+    with measure(stages=stages, stage="features"):
+        tasks.prepare.set_features_table(con=con)
+        tasks.prepare.set_latest_features_table(con=con)
+    with measure(stages=stages, stage="split"):
+        tasks.prepare.set_split_view(con=con, seed=seed)
+        helpers.save.save_data(
+            con=con,
+            codec="zstd",
+            cache_dir=cache_dir,
+            incremental=False,
+            row_group_size=122_880,
+        )
+    con.close()
+
+    with measure(stages=stages, stage="train"):
+        x_train, y_train = helpers.download.get_train_data(cache_dir=cache_dir)
+        model = tasks.train.train(
+            x_train=x_train,
+            y_train=y_train,
+            grid_search=helpers.model.get_model(name=model_name),
+        )
+        exec_date = helpers.save.save_model(
+            model=model, cache_dir=cache_dir, model_name=model_name
+        )
+
+    with measure(stages=stages, stage="evaluate"):
+        metrics, intervals, _ = tasks.evaluate.evaluate(
+            models={(model_name, exec_date): model},
+            batches=helpers.download.get_batches(
+                type_="test", cache_dir=cache_dir, batch_size=1_000_000
+            ),
+        )
+        helpers.save.save_metrics(
+            x=metrics[(model_name, exec_date)],
+            cache_dir=cache_dir,
+            exec_date=exec_date,
+            model_name=model_name,
+        )
+        helpers.save.save_intervals(
+            x=intervals[(model_name, exec_date)],
+            cache_dir=cache_dir,
+            exec_date=exec_date,
+            model_name=model_name,
+        )
+
+    with measure(stages=stages, stage="predict"):
+        tasks.predict.save_predictions(
+            workers=1,
+            horizon=1,
+            exec_date=exec_date,
+            cache_dir=cache_dir,
+            chunk_size=100_000,
+            model_name=model_name,
+        )
+
+    os.environ |= {
+        "API_KEY": "bench",
+        "CACHE_DIR": cache_dir,
+        "EXEC_DATE": exec_date,
+        "MODEL_NAME": model_name,
+        "PREDICTIONS_CACHE_SIZE": "0",
+    }
+    with helpers.download.get_db(cache_dir=cache_dir, read_only=True) as db:
+        names = tasks.predict.get_skus(con=db)
+    api = asyncio.run(
+        run_api(
+            skus=names,
+            requests=requests,
+            batch_sizes=batch_sizes,
+            concurrencies=concurrencies,
+        )
+    )
+
+    return {
+        "params": {
+            "skus": skus,
+            "days": days,
+            "seed": seed,
+            "model_name": model_name,
+            "requests": requests,
+        },
+        "stages": stages,
+        "api": api,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_workers_rss_mb": (
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        ),
+    }
+
+
+def save_results(results: dict, file_path: str) -> None:
+    logging.info(f"save benchmark to {file_path}")
+    with open(file_path, mode="w") as f:
+        json.dump(results, f, indent=2)
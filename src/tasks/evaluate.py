@@ -1,32 +1,179 @@
-"""Evaluate inventory planning model."""
+"""Evaluate inventory planning models."""
 
 import logging
+from collections.abc import Iterable
 
+import numpy
 import pandas
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import (
-    r2_score,
-    mean_squared_error,
-    mean_absolute_error,
-    root_mean_squared_error,
-)
 
+QUANTILES = 10
+MIN_ROWS = 20
 
-def evaluate(
-    model: Pipeline,
-    x_test: pandas.DataFrame,
-    y_test: pandas.DataFrame,
-) -> dict:
-    y_pred = model.predict(X=x_test)
-    mae = mean_absolute_error(y_test, y_pred)
-    mse = mean_squared_error(y_test, y_pred)
-    rmse = root_mean_squared_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
+
+def get_metrics(y_test: numpy.ndarray, y_pred: numpy.ndarray) -> dict:
+    """compute all metrics from one residual array, r2 like sklearn."""
+    residuals = y_pred - y_test
+    sse = float(residuals @ residuals)
+    sst = float(numpy.sum((y_test - y_test.mean()) ** 2))
+    mse = sse / len(residuals)
     output = {
-        "r2": r2,
-        "mae": mae,
+        "r2": 1 - sse / sst if sst > 0 else float(sse == 0),
+        "mae": float(numpy.mean(numpy.abs(residuals))),
         "mse": mse,
-        "rmse": rmse,
+        "rmse": mse**0.5,
     }
     logging.info(output)
     return output
+
+
+def get_groups(residuals: numpy.ndarray, codes: numpy.ndarray, size: int) -> dict:
+    """errors per group with one `bincount` per statistic."""
+    count = numpy.bincount(codes, minlength=size)
+    total = numpy.maximum(count, 1)
+    return {
+        "count": count,
+        "mae": numpy.bincount(codes, weights=numpy.abs(residuals), minlength=size)
+        / total,
+        "rmse": numpy.sqrt(
+            numpy.bincount(codes, weights=residuals**2, minlength=size) / total
+        ),
+        "bias": numpy.bincount(codes, weights=residuals, minlength=size) / total,
+    }
+
+
+def get_buckets(y_test: numpy.ndarray) -> numpy.ndarray:
+    """quantile bucket of every target, ties of discrete targets share a bucket."""
+    edges = numpy.quantile(y_test, q=numpy.linspace(0, 1, QUANTILES + 1)[1:-1])
+    return numpy.searchsorted(edges, y_test, side="right")
+
+
+def get_breakdown(
+    residuals: numpy.ndarray,
+    codes: numpy.ndarray,
+    skus: numpy.ndarray,
+    buckets: numpy.ndarray,
+) -> pandas.DataFrame:
+    """errors per sku and per quantile of the target."""
+    by_sku = pandas.DataFrame(
+        data={
+            "group": "sku",
+            "key": skus,
+            **get_groups(residuals=residuals, codes=codes, size=len(skus)),
+        }
+    )
+    by_quantile = pandas.DataFrame(
+        data={
+            "group": "quantile",
+            "key": [f"q{i}" for i in range(QUANTILES)],
+            **get_groups(residuals=residuals, codes=buckets, size=QUANTILES),
+        }
+    )
+    by_quantile = by_quantile[by_quantile["count"] > 0]
+    return pandas.concat([by_sku, by_quantile], ignore_index=True)
+
+
+def get_quantiles(
+    values: numpy.ndarray, codes: numpy.ndarray, size: int, q: numpy.ndarray
+) -> numpy.ndarray:
+    """linearly interpolated quantiles `q` of the values of every group.
+
+    Values are sorted once within their group, groups without values get NaN.
+    """
+    values = values[numpy.lexsort((values, codes))]
+    count = numpy.bincount(codes, minlength=size)
+    starts = numpy.cumsum(count) - count
+    positions = q[None, :] * numpy.maximum(count - 1, 0)[:, None]
+    low = numpy.floor(positions).astype(numpy.int64)
+    high = numpy.minimum(low + 1, numpy.maximum(count - 1, 0)[:, None])
+    last = max(len(values) - 1, 0)
+    values_low = values[numpy.minimum(starts[:, None] + low, last)]
+    values_high = values[numpy.minimum(starts[:, None] + high, last)]
+    quantiles = values_low + (positions - low) * (values_high - values_low)
+    quantiles[count == 0] = numpy.nan
+    return quantiles
+
+
+def get_intervals(
+    residuals: numpy.ndarray,
+    y_test: numpy.ndarray,
+    codes: numpy.ndarray,
+    size: int,
+    coverage: float,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """residual quantiles framing `coverage` of the targets of every sku.
+
+    Skus with less than `MIN_ROWS` test rows get the quantiles of their volume
+    decile, skus are bucketed by their mean target. Also returns the quantiles
+    of all residuals, used for skus that are not in the test set.
+    """
+    q = numpy.array([(1 - coverage) / 2, (1 + coverage) / 2])
+    count = numpy.bincount(codes, minlength=size)
+    volumes = numpy.bincount(codes, weights=y_test, minlength=size) / count
+    edges = numpy.quantile(volumes, q=numpy.linspace(0, 1, QUANTILES + 1)[1:-1])
+    buckets = numpy.searchsorted(edges, volumes, side="right")
+
+    bounds = get_quantiles(values=residuals, codes=codes, size=size, q=q)
+    by_bucket = get_quantiles(
+        values=residuals, codes=buckets[codes], size=QUANTILES, q=q
+    )
+    bounds[count < MIN_ROWS] = by_bucket[buckets[count < MIN_ROWS]]
+    return bounds, numpy.quantile(residuals, q=q)
+
+
+def evaluate(
+    models: dict[tuple[str, str], Pipeline],
+    batches: Iterable[tuple[pandas.DataFrame, pandas.DataFrame]],
+    coverage: float = 0.8,
+) -> tuple[dict[tuple[str, str], dict], dict[tuple[str, str], dict], pandas.DataFrame]:
+    """score every model on one read of the test batches.
+
+    Models are keyed by `(model_name, exec_date)`, only targets, skus and
+    predictions are kept between batches. Returns the metrics, the per-sku
+    intervals and the error breakdown of every model.
+    """
+    y_batches: list[numpy.ndarray] = list()
+    sku_batches: list[numpy.ndarray] = list()
+    y_pred: dict[tuple[str, str], list[numpy.ndarray]] = {key: list() for key in models}
+    for x_batch, y_batch in batches:
+        y_batches.append(numpy.ravel(y_batch))
+        sku_batches.append(x_batch["sku"].to_numpy())
+        for key, model in models.items():
+            y_pred[key].append(numpy.ravel(model.predict(X=x_batch)))
+
+    y_test = numpy.concatenate(y_batches).astype(numpy.float64)
+    codes, names = pandas.factorize(numpy.concatenate(sku_batches))
+    buckets = get_buckets(y_test=y_test)
+
+    skus = numpy.asarray(names).astype(str)
+    order = numpy.argsort(skus)
+    metrics = dict()
+    intervals = dict()
+    breakdowns = list()
+    for (model_name, exec_date), pred_batches in y_pred.items():
+        logging.info(f"evaluate {model_name} {exec_date}")
+        predictions = numpy.concatenate(pred_batches)
+        metrics[(model_name, exec_date)] = get_metrics(
+            y_test=y_test, y_pred=predictions
+        )
+        breakdown = get_breakdown(
+            codes=codes,
+            skus=skus,
+            buckets=buckets,
+            residuals=predictions - y_test,
+        )
+        breakdowns.append(breakdown.assign(model=model_name, exec_date=exec_date))
+        bounds, default = get_intervals(
+            codes=codes,
+            y_test=y_test,
+            size=len(skus),
+            coverage=coverage,
+            residuals=y_test - predictions,
+        )
+        intervals[(model_name, exec_date)] = {
+            "skus": skus[order],
+            "bounds": bounds[order],
+            "default": default,
+            "coverage": coverage,
+        }
+    return metrics, intervals, pandas.concat(breakdowns, ignore_index=True)
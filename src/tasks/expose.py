@@ -1,7 +1,7 @@
 import uvicorn
 from fastapi import FastAPI
 
-from api.routers import other, predict
+from api.routers import admin, other, predict
 
 import helpers.lifespan
 
@@ -13,6 +13,7 @@ def set_api() -> FastAPI:
     )
     api.include_router(router=other.router)
     api.include_router(router=predict.router)
+    api.include_router(router=admin.router)
 
     return api
 
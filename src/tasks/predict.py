@@ -1,21 +1,127 @@
+"""batch predictions for inventory planning."""
+
+import logging
+from typing import TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas
 from duckdb import DuckDBPyConnection
-from sklearn.pipeline import Pipeline
 
+from helpers.intervals import Intervals
+
+import helpers.save
+import helpers.timer
 import helpers.predict
+import helpers.download
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+metrics: dict
+model: "Pipeline"
+intervals: Intervals | None
+con: DuckDBPyConnection
 
-from api.models.inputs import Inputs
+
+def init(exec_date: str, cache_dir: str, model_name: str) -> None:
+    """initialize worker global variables."""
+    global con, model, metrics, intervals
+
+    con = helpers.download.get_db(cache_dir=cache_dir, read_only=True)
+    model = helpers.download.get_model(
+        exec_date=exec_date,
+        cache_dir=cache_dir,
+        model_name=model_name,
+    )
+    metrics = helpers.download.get_metrics(
+        exec_date=exec_date,
+        cache_dir=cache_dir,
+        model_name=model_name,
+    )
+    intervals = helpers.download.get_intervals(
+        exec_date=exec_date,
+        cache_dir=cache_dir,
+        model_name=model_name,
+    )
+
+
+def get_skus(con: DuckDBPyConnection) -> list[str]:
+    query = "SELECT sku FROM latest_features ORDER BY sku"
+    return con.execute(query).fetch_df()["sku"].tolist()
 
 
 def get_predictions(
-    model: Pipeline, con: DuckDBPyConnection, metrics: dict
+    model: "Pipeline",
+    con: DuckDBPyConnection,
+    metrics: dict,
+    skus: list[str],
+    horizon: int,
+    intervals: Intervals | None = None,
 ) -> pandas.DataFrame:
-    skus = con.execute("SELECT DISTINCT sku FROM features").fetch_df()["sku"].tolist()
-    results = helpers.predict.get_prediction(
-        con=con,
+    features = helpers.predict.get_features(con=con, skus=skus)
+    return helpers.predict.get_prediction(
+        skus=skus,
+        horizon=horizon,
         model=model,
         metrics=metrics,
-        inputs=Inputs(skus=skus),
+        features=features,
+        intervals=intervals,
     )
 
-    return pandas.DataFrame(data=results.model_dump()["value"])
+
+def save_chunk(
+    part: int,
+    horizon: int,
+    cache_dir: str,
+    results_date: str,
+    skus: list[str],
+) -> int:
+    """predict one chunk of skus in a worker and append it to the results."""
+    with helpers.timer.timer(
+        stage="predict.chunk", log=True, part=part, skus=len(skus)
+    ):
+        results = get_predictions(
+            con=con,
+            skus=skus,
+            model=model,
+            metrics=metrics,
+            horizon=horizon,
+            intervals=intervals,
+        )
+    with helpers.timer.timer(stage="predict.save", log=True, part=part):
+        helpers.save.save_results(
+            x=results,
+            part=part,
+            cache_dir=cache_dir,
+            exec_date=results_date,
+        )
+    return len(results)
+
+
+def save_predictions(
+    workers: int,
+    horizon: int,
+    exec_date: str,
+    cache_dir: str,
+    chunk_size: int,
+    model_name: str,
+) -> None:
+    """predict all skus by chunks across a process pool."""
+    with helpers.download.get_db(cache_dir=cache_dir, read_only=True) as db:
+        skus = get_skus(con=db)
+
+    results_date = helpers.save.get_exec_date()
+    chunks = [skus[i : i + chunk_size] for i in range(0, len(skus), chunk_size)]
+    logging.info(f"predict {len(skus)} skus in {len(chunks)} chunks")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init,
+        initargs=(exec_date, cache_dir, model_name),
+    ) as executor:
+        futures = [
+            executor.submit(save_chunk, part, horizon, cache_dir, results_date, chunk)
+            for part, chunk in enumerate(chunks)
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            logging.info(f"chunk {done}/{len(chunks)}: {future.result()} predictions")
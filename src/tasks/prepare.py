@@ -1,74 +1,150 @@
 """prepare training data."""
 
 import os
+import shutil
 import logging
 
-import gdown
-import pandas
 import duckdb
 from duckdb import DuckDBPyConnection
-from sklearn.model_selection import train_test_split
 
+import sql
 
-def set_raw_table(cache_dir: str) -> DuckDBPyConnection:
+
+def get_raw_file(cache_dir: str) -> str:
     folder_path = os.path.join(cache_dir, "datasets/type=raw")
     os.makedirs(folder_path, exist_ok=True)
     file_path = os.path.join(folder_path, "data.csv")
 
     if os.path.exists(file_path) is False:
+        import gdown
+
         logging.info("downloading file from gdrive")
         url = "https://drive.google.com/uc?id=1ZQ8Kj30A_heysk1NJlNLsFYJjkB7POQ0"
         gdown.download(url, file_path, quiet=False)
 
+    return file_path
+
+
+def get_raw_dataset(con: DuckDBPyConnection, cache_dir: str) -> str:
+    """convert the raw csv once to parquet partitioned by year and month.
+
+    The csv is read in parallel with a declared schema instead of sniffing its
+    types, and converted again only when it is newer than the dataset.
+    """
+    file_path = get_raw_file(cache_dir=cache_dir)
+    folder_path = os.path.join(cache_dir, "datasets/type=ingested")
+    if os.path.exists(folder_path) and os.path.getmtime(
+        folder_path
+    ) >= os.path.getmtime(file_path):
+        logging.info(f"raw csv already ingested in {folder_path}")
+        return folder_path
+
+    logging.info(f"ingest raw csv to {folder_path}")
+    tmp_path = f"{folder_path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    con.execute(
+        sql.get_query(name="set_raw_dataset").format(
+            file_path=file_path, folder_path=tmp_path
+        )
+    )
+    shutil.rmtree(folder_path, ignore_errors=True)
+    os.replace(tmp_path, folder_path)
+    return folder_path
+
+
+def get_db(
+    cache_dir: str, memory_limit: str = "", threads: int = 0
+) -> DuckDBPyConnection:
+    """open the database, an empty memory limit or 0 threads keep duckdb defaults."""
     folder_path = os.path.join(cache_dir, "database")
     os.makedirs(folder_path, exist_ok=True)
 
+    config: dict[str, str | int] = dict()
+    if len(memory_limit) > 0:
+        config["memory_limit"] = memory_limit
+    if threads > 0:
+        config["threads"] = threads
     db_path = os.path.join(folder_path, "result.duckdb")
-    conn = duckdb.connect(database=db_path)
-    conn.execute(open("sql/set_raw_table.sql").read().format(file_path=file_path))
+    return duckdb.connect(database=db_path, config=config)
+
+
+def has_raw_table(con: DuckDBPyConnection) -> bool:
+    query = "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'data'"
+    return con.execute(query).fetchall()[0][0] > 0
+
 
-    return conn
+def set_raw_table(con: DuckDBPyConnection, folder_path: str) -> None:
+    con.execute(sql.get_query(name="set_raw_table").format(folder_path=folder_path))
 
 
 def set_features_table(con: DuckDBPyConnection) -> None:
-    con.execute(open("sql/set_features_table.sql").read())
+    query = sql.get_query(name="get_features").format(table="data")
+    con.execute(f"CREATE OR REPLACE TABLE features AS {query}")
+
+
+def set_latest_features_table(con: DuckDBPyConnection) -> None:
+    query = sql.get_query(name="get_latest_features").format(table="features")
+    con.execute(f"CREATE OR REPLACE TABLE latest_features AS {query}")
+
+
+def set_split_view(con: DuckDBPyConnection, seed: int) -> None:
+    """split 20% of each sku rows in test, skus with a single row stay in train."""
+    con.execute(sql.get_query(name="set_split_view").format(seed=int(seed)))
 
 
-def get_train_test_split(
-    con: DuckDBPyConnection,
-) -> tuple[pandas.DataFrame, pandas.DataFrame]:
-    data_frame = con.execute("SELECT * FROM features").fetch_df()
+def insert_raw_table(con: DuckDBPyConnection, folder_path: str) -> int:
+    """append rows newer than the latest date of their sku, keep the tail to update."""
+    con.execute(sql.get_query(name="set_new_table").format(folder_path=folder_path))
+    con.execute(sql.get_query(name="set_tail_table"))
+    con.execute("INSERT INTO data SELECT * FROM new_data")
+    return con.execute("SELECT COUNT(*) FROM new_data").fetchall()[0][0]
 
-    test_list = list()
-    train_list = list()
 
-    unique_skus = data_frame["sku"].unique()
+def insert_features_table(con: DuckDBPyConnection) -> None:
+    """compute features of new rows from the last 7 rows of their sku only."""
+    query = sql.get_query(name="get_features").format(table="tail")
+    con.execute(
+        f"""
+        INSERT INTO features
+        SELECT * FROM ({query}) AS tail_features
+        SEMI JOIN new_data
+        ON tail_features.sku = new_data.sku
+        AND tail_features.dt_submitted = new_data.dt_submitted
+        """
+    )
 
-    for sku in unique_skus:
-        sku_data = data_frame[data_frame["sku"] == sku].sort_values(by="dt_submitted")
 
-        if len(sku_data) > 1:
-            sku_train_data, sku_test_data = train_test_split(
-                sku_data, test_size=0.2, random_state=42
-            )
-            train_list.append(sku_train_data)
-            test_list.append(sku_test_data)
-        else:
-            train_list.append(sku_data)
+def update_latest_features_table(con: DuckDBPyConnection) -> None:
+    query = sql.get_query(name="get_latest_features").format(table="tail")
+    con.execute("DELETE FROM latest_features WHERE sku IN (SELECT sku FROM new_data)")
+    con.execute(f"INSERT INTO latest_features {query}")
 
-    train_data = pandas.concat(train_list)
-    test_data = pandas.concat(test_list)
 
-    return train_data, test_data
+def set_new_split_view(con: DuckDBPyConnection, seed: int) -> None:
+    """split new rows one by one, 20% of them go to test on average."""
+    con.execute(sql.get_query(name="set_new_split_view").format(seed=int(seed)))
 
 
-def get_data(
-    cache_dir: str,
-) -> tuple[DuckDBPyConnection, pandas.DataFrame, pandas.DataFrame]:
+def set_data(con: DuckDBPyConnection, cache_dir: str, seed: int) -> None:
+    folder_path = get_raw_dataset(con=con, cache_dir=cache_dir)
     logging.info("build raw table in duckdb")
-    con = set_raw_table(cache_dir=cache_dir)
+    set_raw_table(con=con, folder_path=folder_path)
     logging.info("build features table in duckdb")
     set_features_table(con=con)
-    logging.info("build training & testing datasets")
-    df_train, df_test = get_train_test_split(con=con)
-    return con, df_train, df_test
+    logging.info("build training & testing split in duckdb")
+    set_split_view(con=con, seed=seed)
+    logging.info("build latest features table in duckdb")
+    set_latest_features_table(con=con)
+
+
+def set_new_data(con: DuckDBPyConnection, cache_dir: str, seed: int) -> None:
+    folder_path = get_raw_dataset(con=con, cache_dir=cache_dir)
+    logging.info("append new rows to raw table in duckdb")
+    count = insert_raw_table(con=con, folder_path=folder_path)
+    logging.info(f"found {count} new rows")
+    logging.info("append new rows to features table in duckdb")
+    insert_features_table(con=con)
+    logging.info("build training & testing split of new rows in duckdb")
+    set_new_split_view(con=con, seed=seed)
+    logging.info("update latest features table in duckdb")
+    update_latest_features_table(con=con)
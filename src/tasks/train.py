@@ -1,22 +1,268 @@
 """train model for inventory planning prediction."""
 
+import time
+import zlib
 import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import numpy
 import pandas
+import scipy.sparse
+from xgboost import XGBRegressor
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import GridSearchCV
+from sklearn.compose import ColumnTransformer
+from sklearn.metrics import mean_absolute_error
+from sklearn.base import RegressorMixin, clone
+from sklearn.model_selection import ParameterSampler, RandomizedSearchCV
+
+import helpers.model
+from helpers.segmented import Segmented
+
+MIN_SEGMENT_ROWS = 100
+
+
+def get_matrix(
+    model: Pipeline,
+    x_train: pandas.DataFrame,
+) -> tuple[ColumnTransformer, numpy.ndarray | scipy.sparse.csr_matrix]:
+    """fit the preprocessor once, candidates and folds only slice its output.
+
+    The output is cast to float so joblib memory-maps it into the search
+    workers instead of pickling one copy per fit.
+    """
+    preprocessor = clone(model.named_steps["preprocessor"]).fit(X=x_train)
+    matrix = preprocessor.transform(X=x_train).astype(numpy.float64)
+    return preprocessor, matrix
+
+
+def get_params(params: dict) -> dict:
+    """strip the pipeline step prefix from parameters of the regressor."""
+    return {k.removeprefix("regressor__"): v for k, v in params.items()}
 
 
 def train(
-    grid_search: GridSearchCV,
+    grid_search: RandomizedSearchCV,
     x_train: pandas.DataFrame,
     y_train: pandas.DataFrame,
 ) -> Pipeline:
-    grid_search.fit(X=x_train, y=y_train)
+    preprocessor, matrix = get_matrix(model=grid_search.estimator, x_train=x_train)
+    search = clone(grid_search).set_params(
+        estimator=grid_search.estimator.named_steps["regressor"],
+        param_distributions=get_params(params=grid_search.param_distributions),
+    )
+    search.fit(X=matrix, y=y_train)
 
-    best_params = grid_search.best_params_
-    best_score = -grid_search.best_score_
+    best_params = search.best_params_
+    best_score = -search.best_score_
     logging.info(f"Best Parameters: {best_params}")
     logging.info(f"Best Mean Absolute Error: {best_score}")
 
-    return grid_search.best_estimator_
+    return Pipeline(
+        steps=[
+            ("preprocessor", preprocessor),
+            ("regressor", search.best_estimator_),
+        ]
+    )
+
+
+def fit_fold(
+    regressor: RegressorMixin,
+    params: dict,
+    x_train: numpy.ndarray | scipy.sparse.csr_matrix,
+    y_train: pandas.DataFrame,
+    x_valid: numpy.ndarray | scipy.sparse.csr_matrix,
+    y_valid: pandas.DataFrame,
+    early_stopping_rounds: int,
+) -> tuple[float, int | None]:
+    """fit a candidate on a fold, xgboost stops early on the fold validation slice."""
+    regressor = clone(regressor).set_params(**params)
+    if isinstance(regressor, XGBRegressor) is False or early_stopping_rounds == 0:
+        regressor.fit(X=x_train, y=y_train)
+        return mean_absolute_error(y_valid, regressor.predict(X=x_valid)), None
+
+    regressor.set_params(early_stopping_rounds=early_stopping_rounds)
+    regressor.fit(
+        X=x_train,
+        y=y_train,
+        eval_set=[(x_valid, y_valid)],
+        verbose=False,
+    )
+    y_pred = regressor.predict(X=x_valid)
+    return mean_absolute_error(y_valid, y_pred), regressor.best_iteration + 1
+
+
+def train_halving(
+    grid_search: RandomizedSearchCV,
+    x_train: pandas.DataFrame,
+    y_train: pandas.DataFrame,
+    factor: int,
+    budget: float,
+    max_fits: int,
+    early_stopping_rounds: int,
+) -> Pipeline:
+    """successive halving over the cv folds of the randomized search candidates.
+
+    Every candidate is scored on the first fold, the best `1 / factor` are then
+    scored on `factor` times more folds, until one rung covers all folds. The
+    search stops early once `budget` seconds or `max_fits` fits are spent (0 is
+    unlimited), and the best candidate is refitted on the whole training set.
+    """
+    start = time.perf_counter()
+    preprocessor, matrix = get_matrix(model=grid_search.estimator, x_train=x_train)
+    regressor = grid_search.estimator.named_steps["regressor"]
+    folds = list(grid_search.cv.split(matrix))
+    candidates = list(
+        ParameterSampler(
+            param_distributions=get_params(params=grid_search.param_distributions),
+            n_iter=grid_search.n_iter,
+            random_state=grid_search.random_state,
+        )
+    )
+    scores: list[list[float]] = [list() for _ in candidates]
+    iterations: list[list[int]] = [list() for _ in candidates]
+
+    def is_exhausted(fits: int) -> bool:
+        return (budget > 0 and time.perf_counter() - start > budget) or (
+            max_fits > 0 and fits >= max_fits
+        )
+
+    fits = 0
+    pruned = 0
+    n_folds = 1
+    alive = list(range(len(candidates)))
+    while is_exhausted(fits=fits) is False:
+        for i in alive:
+            for train_index, valid_index in folds[len(scores[i]) : n_folds]:
+                if is_exhausted(fits=fits):
+                    break
+                score, iteration = fit_fold(
+                    regressor=regressor,
+                    params=candidates[i],
+                    x_train=matrix[train_index],
+                    y_train=y_train.iloc[train_index],
+                    x_valid=matrix[valid_index],
+                    y_valid=y_train.iloc[valid_index],
+                    early_stopping_rounds=early_stopping_rounds,
+                )
+                scores[i].append(score)
+                if iteration is not None:
+                    iterations[i].append(iteration)
+                fits += 1
+
+        if is_exhausted(fits=fits) or n_folds == len(folds) or len(alive) == 1:
+            break
+        keep = max(1, len(alive) // factor)
+        pruned += (len(alive) - keep) * (len(folds) - n_folds)
+        alive = sorted(alive, key=lambda i: float(numpy.mean(scores[i])))[:keep]
+        n_folds = min(len(folds), n_folds * factor)
+        logging.info(f"{len(alive)} candidates left, scored on {n_folds} folds")
+
+    if fits == 0:
+        raise ValueError("search budget is exhausted before the first fit")
+
+    best = min(
+        (i for i in range(len(candidates)) if len(scores[i]) > 0),
+        key=lambda i: (-len(scores[i]), float(numpy.mean(scores[i]))),
+    )
+    best_params = dict(candidates[best])
+    if len(iterations[best]) > 0:
+        best_params["n_estimators"] = int(numpy.median(iterations[best]))
+
+    elapsed = time.perf_counter() - start
+    skipped = len(candidates) * len(folds) - fits - pruned
+    logging.info(
+        f"Fits: {fits}, pruned: {pruned}, skipped by budget: {skipped}, "
+        f"elapsed: {elapsed:.1f}s"
+    )
+    logging.info(f"Estimated time saved: {pruned * elapsed / fits:.1f}s")
+    logging.info(f"Best Parameters: {best_params}")
+    logging.info(f"Best Mean Absolute Error: {numpy.mean(scores[best])}")
+
+    regressor = clone(regressor).set_params(**best_params)
+    return Pipeline(
+        steps=[
+            ("preprocessor", preprocessor),
+            ("regressor", regressor.fit(X=matrix, y=y_train)),
+        ]
+    )
+
+
+def get_segments(
+    x_train: pandas.DataFrame,
+    y_train: pandas.DataFrame,
+    segments: int,
+    segment_by: str,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """sorted skus and their segment, by hash of the sku or by volume quantile."""
+    skus, inverse = numpy.unique(
+        x_train["sku"].to_numpy(dtype=str), return_inverse=True
+    )
+    if segment_by == "hash":
+        codes = numpy.array([zlib.crc32(sku.encode()) % segments for sku in skus])
+    elif segment_by == "volume":
+        y = numpy.ravel(y_train).astype(numpy.float64)
+        volumes = numpy.bincount(inverse, weights=y) / numpy.bincount(inverse)
+        edges = numpy.quantile(volumes, q=numpy.linspace(0, 1, segments + 1)[1:-1])
+        codes = numpy.searchsorted(edges, volumes, side="right")
+    else:
+        raise NotImplementedError(f"segment provided doesn't exist {segment_by}")
+    return skus, codes
+
+
+def fit_segment(
+    model_name: str,
+    n_iter: int,
+    x_train: pandas.DataFrame,
+    y_train: pandas.DataFrame,
+) -> Pipeline:
+    """random search of one segment in a worker, the search itself is sequential."""
+    grid_search = helpers.model.get_model(name=model_name)
+    grid_search.set_params(n_jobs=1, n_iter=n_iter)
+    return train(grid_search=grid_search, x_train=x_train, y_train=y_train)
+
+
+def train_segments(
+    model_name: str,
+    x_train: pandas.DataFrame,
+    y_train: pandas.DataFrame,
+    segments: int,
+    segment_by: str,
+    workers: int,
+) -> Segmented:
+    """train one model per segment of skus across a process pool.
+
+    Each segment runs its own search with `1 / segments` of the candidates,
+    segments with less than `MIN_SEGMENT_ROWS` rows are routed to the largest.
+    """
+    skus, codes = get_segments(
+        x_train=x_train,
+        y_train=y_train,
+        segments=segments,
+        segment_by=segment_by,
+    )
+    rows = codes[numpy.searchsorted(skus, x_train["sku"].to_numpy(dtype=str))]
+    counts = numpy.bincount(rows, minlength=segments)
+    default = int(numpy.argmax(counts))
+    if counts[default] < MIN_SEGMENT_ROWS:
+        raise ValueError(f"No segment has {MIN_SEGMENT_ROWS} training rows")
+    n_iter = max(1, helpers.model.get_model(name=model_name).n_iter // segments)
+    logging.info(f"train {segments} segments by {segment_by}, rows: {counts.tolist()}")
+
+    models = dict()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                fit_segment,
+                model_name,
+                n_iter,
+                x_train[rows == segment],
+                y_train[rows == segment],
+            ): segment
+            for segment in range(segments)
+            if counts[segment] >= MIN_SEGMENT_ROWS
+        }
+        for future in as_completed(futures):
+            models[futures[future]] = future.result()
+            logging.info(f"segment {futures[future]} trained")
+
+    return Segmented(skus=skus, segments=codes, models=models, default=default)